@@ -0,0 +1,65 @@
+// Clientside callbacks for dash_app.py: navigation runs in the browser, no server round trip
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    mta: (function () {
+        // Same order as the sidebar links and the page shells in app.layout
+        var PAGES = ['/about', '/overview', '/segment'];
+        var DEFAULT_PAGE = '/about';
+
+        // KPI numbers to two decimals; 'inf', '-inf' and 'nan' arrive as text (see AggregateCube.kpi_table)
+        function formatKpi(value, grouped) {
+            if (typeof value === 'string') {
+                return value;
+            }
+            return grouped ? value.toLocaleString('en-US', {minimumFractionDigits: 2, maximumFractionDigits: 2}) : value.toFixed(2);
+        }
+
+        function isIncrease(value) {
+            return typeof value === 'string' ? value === 'inf' : value >= 0;
+        }
+
+        // YoY line under a KPI, green for an increase and red for a decrease
+        function yoyParagraph(text, increase) {
+            return {
+                namespace: 'dash_html_components',
+                type: 'P',
+                props: {children: text, className: increase ? 'kpi-up' : 'kpi-down'}
+            };
+        }
+
+        return {
+            // Classes for the about/overview/segment links (see mta_styles); unknown paths highlight nothing
+            highlightActiveLink: function (pathname) {
+                return PAGES.map(function (page) {
+                    return page === pathname ? 'nav-link nav-link-active' : 'nav-link';
+                });
+            },
+
+            // Show the shell for the current page and hide the others. The first visit to a page adds it to
+            // loaded-pages, which asks the server for its layout once; later visits only toggle visibility.
+            showPage: function (pathname, loadedPages) {
+                var current = PAGES.indexOf(pathname) >= 0 ? pathname : DEFAULT_PAGE;
+                var styles = PAGES.map(function (page) {
+                    return {display: page === current ? 'block' : 'none'};
+                });
+                loadedPages = loadedPages || [];
+                var loaded = loadedPages.indexOf(current) >= 0 ? window.dash_clientside.no_update : loadedPages.concat([current]);
+                return styles.concat([loaded]);
+            },
+
+            // Segment KPI cards for the selected mode and year, looked up in the segment-kpi-table store
+            updateSegmentKpis: function (mode, year, table) {
+                var kpis = table && table.modes[mode];
+                var i = table ? table.years.indexOf(year) : -1;
+                if (!kpis || i < 0 || kpis.count[i] === 0) {
+                    return ['No data available', '', '', ''];
+                }
+                return [
+                    formatKpi(kpis.total[i], true) + 'M',
+                    yoyParagraph('YoY % Change: ' + formatKpi(kpis.yoy[i], true) + '%', isIncrease(kpis.yoy[i])),
+                    formatKpi(kpis.mean[i], false) + '%',
+                    yoyParagraph('YoY Change: ' + formatKpi(kpis.meanDiff[i], false) + '%', isIncrease(kpis.meanYoy[i]))
+                ];
+            }
+        };
+    })()
+});
@@ -0,0 +1,213 @@
+import argparse
+import json
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import warnings
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# dash_app loads its data at import: point it at a synthetic feed written in main() (no network, no snapshot).
+# This has to happen before mta_data is imported, since it reads the environment once.
+BOOT_DIR = tempfile.mkdtemp(prefix='mta-bench-')
+BOOT_CSV = os.path.join(BOOT_DIR, 'boot.csv')
+os.environ['MTA_DATA_URL'] = BOOT_CSV
+os.environ['MTA_SNAPSHOT_PATH'] = ''
+os.environ['MTA_RESULT_CACHE'] = ''  # Callbacks are timed directly, never through the shared cache
+
+import pandas as pd  # noqa: E402
+from plotly.utils import PlotlyJSONEncoder  # noqa: E402
+
+from benchmarks.synthetic import synthetic_raw  # noqa: E402
+from mta_data import prepare_data, read_snapshot, write_snapshot  # noqa: E402
+from mta_dataset import Dataset, swap_dataset  # noqa: E402
+from mta_figures import mode_share_figure  # noqa: E402
+from mta_trends import GRANULARITIES  # noqa: E402
+
+PAGES = ['/about', '/overview', '/segment']
+
+
+# Median and best wall time (ms) of `repeat` runs of fn()
+def timed(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - start) * 1000)
+    return {'median_ms': statistics.median(times), 'min_ms': min(times)}
+
+
+# The undecorated callback function, so it can be called outside a Dash request
+def _raw(callback):
+    return getattr(callback, '__wrapped__', callback)
+
+
+# Load-phase timings for one synthetic frame
+def bench_load(raw, repeat, workdir):
+    results = {}
+    csv_path = os.path.join(workdir, 'ridership.csv')
+    raw.to_csv(csv_path, index=False)
+    results['load: csv parse'] = timed(lambda: pd.read_csv(csv_path), repeat)
+
+    parsed = pd.read_csv(csv_path)
+    results['load: pd.to_datetime'] = timed(lambda: pd.to_datetime(parsed['Date']), repeat)
+
+    # Dates already parsed, so this is the renames, derived columns, sort and dtype compaction
+    dated = parsed.assign(Date=pd.to_datetime(parsed['Date']))
+    results['load: derived columns'] = timed(lambda: prepare_data(dated.copy()), repeat)
+
+    data = prepare_data(parsed.copy())
+    snapshot_path = os.path.join(workdir, 'ridership.snap')
+    results['load: snapshot write'] = timed(lambda: write_snapshot(data, snapshot_path), repeat)
+    results['load: snapshot read'] = timed(lambda: read_snapshot(snapshot_path), repeat)
+    results['load: cube + indexes + trend series'] = timed(lambda: Dataset(data), repeat)
+
+    ds = Dataset(data)
+    results['load: 2020/2024 mode share chart'] = timed(lambda: mode_share_figure(ds.cube), repeat)
+    return ds, results
+
+
+# Every callback for every page / mode / year combination, against `ds`
+def bench_callbacks(dash_app, ds, repeat):
+    results = {}
+    years = [int(year) for year in ds.years]
+    modes = dash_app.transport_modes
+    load_page = _raw(dash_app.load_page)
+    update_overview_kpis = _raw(dash_app.update_overview_kpis)
+    update_overview_trend = _raw(dash_app.update_overview_trend)
+    update_segment_trend = _raw(dash_app.update_segment_trend)
+    update_yoy_overlay = _raw(dash_app.update_yoy_overlay)
+    update_ytd_comparison = _raw(dash_app.update_ytd_comparison)
+    update_summary_table = _raw(dash_app.update_summary_table)
+
+    # Cold: a freshly swapped-in dataset, so page, figure and summary caches start empty
+    def cold(fn):
+        def run():
+            swap_dataset(Dataset(ds.data, ds.cube.extended(ds.data.iloc[:0]), ds.ranges, ds.trends, ds.overlay))
+            dash_app.pages.clear()
+            dash_app.figure_cache.clear()
+            fn()
+        return run
+
+    swap_dataset(ds)
+    results['callback: load_page x pages (cold)'] = timed(cold(lambda: [load_page([page]) for page in PAGES]), repeat)
+    results['callback: load_page x pages (warm)'] = timed(lambda: [load_page([page]) for page in PAGES], repeat)
+    results['callback: update_overview_kpis x years'] = timed(lambda: [update_overview_kpis(year) for year in years], repeat)
+    results['callback: update_overview_trend x granularities (cold)'] = timed(
+        cold(lambda: [update_overview_trend(granularity) for granularity in GRANULARITIES]), repeat
+    )
+    results['callback: update_overview_trend x granularities (warm)'] = timed(
+        lambda: [update_overview_trend(granularity) for granularity in GRANULARITIES], repeat
+    )
+    results['callback: update_segment_trend x modes (cold)'] = timed(cold(lambda: [update_segment_trend(mode) for mode in modes]), repeat)
+    results['callback: update_segment_trend x modes (warm)'] = timed(lambda: [update_segment_trend(mode) for mode in modes], repeat)
+    results['callback: update_segment_trend x modes x granularities (cold)'] = timed(
+        cold(lambda: [update_segment_trend(mode, granularity) for mode in modes for granularity in GRANULARITIES]), repeat
+    )
+    results['callback: update_yoy_overlay x modes (cold)'] = timed(cold(lambda: [update_yoy_overlay(mode) for mode in modes]), repeat)
+    results['callback: update_yoy_overlay x modes (warm)'] = timed(lambda: [update_yoy_overlay(mode) for mode in modes], repeat)
+    results['callback: update_ytd_comparison x modes x years'] = timed(
+        lambda: [update_ytd_comparison(mode, year) for mode in modes for year in years], repeat
+    )
+    # Segment KPIs are looked up in the browser; the server's share is building the table shipped with the page
+    results['segment kpi table (all modes x years)'] = timed(lambda: ds.cube.kpi_table(modes), repeat)
+    results['callback: update_summary_table x modes (cold)'] = timed(cold(lambda: [update_summary_table(mode) for mode in modes]), repeat)
+    results['callback: update_summary_table x modes (warm)'] = timed(lambda: [update_summary_table(mode) for mode in modes], repeat)
+    return results
+
+
+# Drop figures and store data from a layout, leaving the markup, classes and styles
+def _structure(component):
+    if isinstance(component, (list, tuple)):
+        return [_structure(child) for child in component]
+    if not hasattr(component, 'to_plotly_json'):
+        return component
+    spec = component.to_plotly_json()
+    props = {name: value for name, value in spec['props'].items() if name not in ('figure', 'data')}
+    if 'children' in props:
+        props['children'] = _structure(props['children'])
+    return {**spec, 'props': props}
+
+
+# Serialized bytes of the app shell and each page layout: everything, and without figures and store data
+def layout_bytes(dash_app, ds):
+    def size(layout):
+        return len(json.dumps(layout, cls=PlotlyJSONEncoder, separators=(',', ':')))
+
+    layouts = {'shell': dash_app.app.layout, **{page: dash_app.pages.get(page, ds) for page in PAGES}}
+    return {name: (size(layout), size(_structure(layout))) for name, layout in layouts.items()}
+
+
+def print_results(scale, rows, results):
+    print(f"\n== {scale:g}x ({rows:,} rows) ==")
+    for name, timing in results.items():
+        print(f"  {name:<52}{timing['median_ms']:>10.2f} ms  (min {timing['min_ms']:.2f})")
+
+
+# Metrics that got slower than the baseline by more than `tolerance` (a fraction)
+def regressions(results, baseline, tolerance):
+    slower = []
+    for scale, metrics in results.items():
+        for name, timing in metrics.items():
+            before = baseline.get(scale, {}).get(name)
+            if before and timing['median_ms'] > before['median_ms'] * (1 + tolerance):
+                slower.append(f"{scale}x {name}: {before['median_ms']:.2f} -> {timing['median_ms']:.2f} ms")
+    return slower
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time data loading and every dashboard callback on synthetic data")
+    parser.add_argument('--scales', type=float, nargs='+', default=[1, 10, 100], help="Multiples of the real row count")
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--json', help="Write results to this file")
+    parser.add_argument('--baseline', help="Results file from an earlier run to check for regressions")
+    parser.add_argument('--tolerance', type=float, default=0.25, help="Allowed slowdown vs the baseline (0.25 = 25%%)")
+    args = parser.parse_args(argv)
+
+    # The first year's YoY KPIs divide by an empty previous year; that's expected, not benchmark noise
+    warnings.filterwarnings('ignore', message='divide by zero', category=RuntimeWarning)
+
+    all_results = {}
+    try:
+        # Time the app's module-level work against the 1x synthetic feed
+        synthetic_raw(1).to_csv(BOOT_CSV, index=False)
+        start = time.perf_counter()
+        import dash_app
+        print(f"import dash_app (1x, no snapshot): {(time.perf_counter() - start) * 1000:.1f} ms")
+    finally:
+        shutil.rmtree(BOOT_DIR, ignore_errors=True)
+
+    print("layout JSON bytes (total / without figures and store data):")
+    for name, (total, structure) in layout_bytes(dash_app, dash_app.current_dataset()).items():
+        print(f"  {name:<12}{total:>10,} / {structure:,}")
+
+    with tempfile.TemporaryDirectory() as workdir:
+        for scale in args.scales:
+            raw = synthetic_raw(scale)
+            ds, results = bench_load(raw, args.repeat, workdir)
+            results.update(bench_callbacks(dash_app, ds, args.repeat))
+            print_results(scale, len(raw), results)
+            all_results[f'{scale:g}'] = results
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(all_results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            slower = regressions(all_results, json.load(f), args.tolerance)
+        if slower:
+            print("\nRegressions:")
+            for line in slower:
+                print(f"  {line}")
+            return 1
+        print("\nNo regressions against the baseline")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,106 @@
+import argparse
+import datetime
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mta_data import RENAME_COLUMNS, segments  # noqa: E402
+
+# The real daily export covers 2020-03-01 .. 2024-10-31
+REAL_START = pd.Timestamp('2020-03-01')
+REAL_END = pd.Timestamp('2024-10-31')
+REAL_ROWS = (REAL_END - REAL_START).days + 1
+
+# Rough pre-pandemic daily volume per mode, so synthetic totals and mode shares look like the real feed
+BASE_RIDERSHIP = {
+    'Subways': 5_500_000,
+    'Buses': 2_200_000,
+    'LIRR': 300_000,
+    'Metro-North': 280_000,
+    'Access-A-Ride': 30_000,
+    'Bridges and Tunnels': 900_000,
+    'Staten Island Railway': 16_000,
+}
+
+# Weekday multipliers (Monday first): weekends run well below weekdays
+WEEKLY_PATTERN = np.array([1.0, 1.03, 1.04, 1.02, 0.97, 0.62, 0.48])
+
+# Range pandas' nanosecond timestamps can hold, with some margin
+MIN_START = datetime.date(1678, 1, 1)
+MAX_END = datetime.date(2261, 12, 31)
+
+
+# Raw frame shaped like MTA_Ridership_by_DATA_NY_GOV.csv (same columns, MM/DD/YYYY dates, newest day first)
+# with `scale` times the real row count. Extra rows extend the history backwards (and, past the limits of
+# datetime64[ns], forwards) so the 2020-2024 window the dashboard plots is always covered.
+def synthetic_raw(scale=1, seed=0):
+    rng = np.random.default_rng(seed)
+    n = int(REAL_ROWS * scale)
+    start = REAL_START.date() - datetime.timedelta(days=n - REAL_ROWS)
+    if start < MIN_START:
+        start = MAX_END - datetime.timedelta(days=n - 1)
+    dates = pd.date_range(start, periods=n, freq='D')
+
+    # Share of pre-pandemic ridership: a slow multi-year swing, the 2020 collapse and a partial recovery
+    t = np.arange(n)
+    share = 0.8 + 0.15 * np.sin(2 * np.pi * t / (365.25 * 7))
+    since_covid = (dates - pd.Timestamp('2020-03-15')).days.to_numpy()
+    covid = since_covid >= 0
+    share[covid] = np.minimum(0.1 + 0.6 * (1 - np.exp(-since_covid[covid] / 500)), share[covid])
+    weekly = WEEKLY_PATTERN[dates.weekday]
+
+    inverse_names = {short: original for original, short in RENAME_COLUMNS.items()}
+    columns = {'Date': dates.strftime('%m/%d/%Y')}
+    for segment in segments:
+        mode_share = np.clip(share * rng.normal(1.0, 0.05, n), 0.02, 1.3)
+        columns[inverse_names[segment]] = np.round(BASE_RIDERSHIP[segment] * mode_share * weekly).astype(np.int64)
+        columns[inverse_names[f'{segment} %']] = np.round(mode_share * 100).astype(np.int64)
+    return pd.DataFrame(columns).iloc[::-1].reset_index(drop=True)
+
+
+# A fine-grained feed shaped like the production one: one row per station per hour, with the same measure
+# columns as the daily export. Summing it per day gives back synthetic_raw(scale) for the first `days` days.
+def synthetic_station_hourly(days=30, stations=50, scale=1, seed=0):
+    rng = np.random.default_rng(seed)
+    daily = synthetic_raw(scale, seed).iloc[::-1].head(days).reset_index(drop=True)
+    cells = stations * 24
+    hours = np.tile(np.repeat(np.arange(24), stations), len(daily))
+    columns = {
+        'Date': (
+            np.repeat(pd.to_datetime(daily['Date']).to_numpy(), cells) + hours.astype('timedelta64[h]')
+        ).astype('datetime64[s]').astype(str),
+        'Station': np.tile(np.arange(stations), 24 * len(daily)),
+    }
+    for name in daily.columns[1:]:
+        values = daily[name].to_numpy()
+        if '% of Comparable' in name:
+            columns[name] = np.repeat(values, cells)
+        else:
+            # Split each day's count across station-hours so the daily sums are exact
+            columns[name] = np.concatenate([rng.multinomial(value, np.full(cells, 1 / cells)) for value in values])
+    return pd.DataFrame(columns)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Write an MTA-shaped synthetic ridership CSV")
+    parser.add_argument('--scale', type=float, default=1, help="Multiple of the real row count")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--hourly-stations', type=int, help="Write a per-station, per-hour feed with this many stations")
+    parser.add_argument('--days', type=int, default=30, help="Days covered by the per-station feed")
+    parser.add_argument('-o', '--output', required=True)
+    args = parser.parse_args(argv)
+
+    if args.hourly_stations:
+        raw = synthetic_station_hourly(args.days, args.hourly_stations, args.scale, args.seed)
+    else:
+        raw = synthetic_raw(args.scale, args.seed)
+    raw.to_csv(args.output, index=False)
+    print(f"Wrote {len(raw):,} rows to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,17 @@
+import sys
+
+from mta_data import SHARED_DATA
+
+# gunicorn reads this file automatically when started from the repo root: gunicorn dash_app:server
+
+# With MTA_SHARED_DATA=1 the app (and its dataset) is imported once in the master before forking, and the
+# prepared columns are served from the snapshot's read-only memory map, so every worker shares one copy
+preload_app = SHARED_DATA
+
+
+# A worker shutting down lets its background refresher finish the refresh in progress first (see
+# mta_dataset.Refresher.stop)
+def worker_exit(server, worker):
+    dash_app = sys.modules.get('dash_app')
+    if dash_app is not None:
+        dash_app.refresher.stop(timeout=30)
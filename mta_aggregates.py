@@ -0,0 +1,307 @@
+import copy
+
+import numpy as np
+
+from mta_data import COUNT_COLUMNS, DAY_TYPE_MASKS, segments
+
+# Every measure the KPIs read: the segment counts, their total and each segment's % of pre-pandemic day
+CUBE_MEASURES = segments + ['Total Ridership'] + [f'{segment} %' for segment in segments]
+
+# Columns of the Segment page summary table, in display order
+DAY_TYPES = ['Weekday', 'Weekend', 'Sunday', 'Total']
+
+
+# Sums and non-null counts of every measure by Year x Month x weekday, built once at load time.
+# Means at any roll-up are sum / count, so KPI lookups never touch the row-level frame.
+class AggregateCube:
+    def __init__(self, data, measures=CUBE_MEASURES):
+        self.measures = list(measures)
+        # Counts are shown without a trailing '.0' in the summary table
+        self.integer_measures = {measure for measure in self.measures if measure in COUNT_COLUMNS}
+        self._measure_pos = {measure: i for i, measure in enumerate(self.measures)}
+        self._set_years(sorted(int(year) for year in data['Year'].unique()))
+
+        self.sums = np.zeros((len(self.years), 12, 7, len(self.measures)))
+        self.counts = np.zeros((len(self.years), 12, 7, len(self.measures)), dtype=np.int64)
+        self._accumulate(data)
+
+    def _set_years(self, years):
+        self.years = years
+        self._year_pos = {year: i for i, year in enumerate(self.years)}
+
+    # Add the rows of `data` into the sums and counts (its years must already be on the year axis)
+    def _accumulate(self, data):
+        shape = self.sums.shape[:3]
+        cells = np.ravel_multi_index(
+            (
+                np.searchsorted(self.years, data['Year'].to_numpy()),
+                data['Month'].to_numpy() - 1,
+                data['Day of Week'].to_numpy(),
+            ),
+            shape
+        )
+        n_cells = int(np.prod(shape))
+
+        for i, measure in enumerate(self.measures):
+            values = data[measure].to_numpy(dtype=np.float64)
+            present = ~np.isnan(values)
+            self.sums[..., i] += np.bincount(
+                cells[present], weights=values[present], minlength=n_cells
+            ).reshape(shape)
+            self.counts[..., i] += np.bincount(cells[present], minlength=n_cells).reshape(shape)
+
+        # Weekday/Weekend/Sunday/Total for every year and every measure at once: (years, day types, measures)
+        by_weekday = self.sums.sum(axis=1)
+        self.day_type_sums = np.stack(
+            [
+                by_weekday[:, :5].sum(axis=1),
+                by_weekday[:, 5:].sum(axis=1),
+                by_weekday[:, 6],
+                by_weekday.sum(axis=1),
+            ],
+            axis=1
+        )
+        self._summary_rows = {}
+
+    # A new cube covering this one plus `new_rows`; costs the size of the cube and the new rows, not the history
+    def extended(self, new_rows):
+        cube = copy.copy(self)
+        cube._set_years(sorted(set(self.years) | {int(year) for year in new_rows['Year'].unique()}))
+        positions = [cube._year_pos[year] for year in self.years]
+        cube.sums = np.zeros((len(cube.years),) + self.sums.shape[1:])
+        cube.counts = np.zeros((len(cube.years),) + self.counts.shape[1:], dtype=np.int64)
+        cube.sums[positions] = self.sums
+        cube.counts[positions] = self.counts
+        cube._accumulate(new_rows)
+        return cube
+
+    # Index into one of the cube arrays; month is 1-12, weekday is 0-6 or a list of them
+    def _select(self, array, measure, year, month=None, weekday=None):
+        year_pos = self._year_pos.get(year)
+        if year_pos is None:
+            return array.dtype.type(0)  # Years outside the data behave like an empty selection
+        cell = array[year_pos, :, :, self._measure_pos[measure]]
+        if month is not None:
+            cell = cell[month - 1]
+        if weekday is not None:
+            cell = cell[..., weekday]
+        return cell.sum()
+
+    def total(self, measure, year, month=None, weekday=None):
+        return self._select(self.sums, measure, year, month, weekday)
+
+    def count(self, measure, year, month=None, weekday=None):
+        return self._select(self.counts, measure, year, month, weekday)
+
+    def mean(self, measure, year, month=None, weekday=None):
+        count = self.count(measure, year, month, weekday)
+        if count == 0:
+            return np.float64(np.nan)
+        return self.total(measure, year, month, weekday) / count
+
+    # {year: (total, count)} of one measure for every year of the cube
+    def _yearly_totals(self, measure):
+        i = self._measure_pos[measure]
+        return {year: (self.sums[pos, :, :, i].sum(), self.counts[pos, :, :, i].sum()) for year, pos in self._year_pos.items()}
+
+    # (years, DAY_TYPES) sums of one measure
+    def _day_type_totals(self, measure):
+        return self.day_type_sums[:, :, self._measure_pos[measure]]
+
+    # Rows for the Segment page summary table, built once per measure and reused on every selection
+    def yearly_summary(self, measure):
+        rows = self._summary_rows.get(measure)
+        if rows is None:
+            totals = self._day_type_totals(measure)
+            if measure in self.integer_measures:
+                totals = totals.round().astype(np.int64)
+            rows = [
+                dict(Year=year, **{day_type: "{:,}".format(value) for day_type, value in zip(DAY_TYPES, year_totals.tolist())})
+                for year, year_totals in zip(self.years, totals)
+            ]
+            self._summary_rows[measure] = rows
+        return rows
+
+    # Segment page KPIs for every mode and year, shipped to the browser once so dropdown changes are
+    # lookups there (see assets/clientside.js). Per mode, one list per field, aligned with 'years'.
+    def kpi_table(self, modes):
+        table = {'years': self.years, 'modes': {}}
+        with np.errstate(divide='ignore', invalid='ignore'):
+            for mode in modes:
+                kpis = {'count': [], 'total': [], 'yoy': [], 'mean': [], 'meanDiff': [], 'meanYoy': []}
+                # Every year of the mode and its % column at once, rather than a lookup per year and field
+                totals = self._yearly_totals(mode)
+                percents = self._yearly_totals(f'{mode} %')
+                for year in self.years:
+                    # Total ridership in millions and its YoY % change
+                    total = totals[year][0] / 1_000_000
+                    previous_total = totals.get(year - 1, (np.float64(0), 0))[0] / 1_000_000
+                    # Average % of pre-pandemic day, its YoY difference and YoY % change
+                    mean = _yearly_mean(percents, year)
+                    previous_mean = _yearly_mean(percents, year - 1)
+                    kpis['count'].append(int(totals[year][1]))
+                    kpis['total'].append(_json_number(total))
+                    kpis['yoy'].append(_json_number((total - previous_total) / previous_total * 100))
+                    kpis['mean'].append(_json_number(mean))
+                    kpis['meanDiff'].append(_json_number(mean - previous_mean))
+                    kpis['meanYoy'].append(_json_number((mean - previous_mean) / previous_mean * 100))
+                table['modes'][mode] = kpis
+        return table
+
+
+def _yearly_mean(totals, year):
+    total, count = totals.get(year, (np.float64(0), 0))
+    return total / count if count else np.float64(np.nan)
+
+
+# JSON has no inf/nan, so those go out as the text Python would have printed for them ('inf', '-inf', 'nan')
+def _json_number(value):
+    value = float(value)
+    return value if np.isfinite(value) else f"{value}"
+
+
+# Maps each year and (year, month) to a contiguous row slice of a date-sorted frame, so year and
+# year-range selections are positional slices of the frame instead of boolean-mask copies. Keys come
+# from 'Date', so it indexes the prepared frame and the weekly/monthly trend series alike.
+class YearIndex:
+    def __init__(self, data):
+        dates = data['Date'].to_numpy()
+        if len(dates) > 1 and (dates[1:] < dates[:-1]).any():
+            raise ValueError("YearIndex needs the frame sorted by 'Date'")
+        self.data = data
+        self._years, months = self._calendar(dates)
+        self._year_slices = self._partition(self._years)
+        self._year_month_slices = self._month_slices(self._years * 100 + months)
+
+    @staticmethod
+    def _calendar(dates):
+        months = dates.astype('datetime64[M]').astype(np.int64)
+        return months // 12 + 1970, months % 12 + 1
+
+    # Index for `data`, whose first `new_start` rows are the rows this index already covers
+    def extended(self, data, new_start):
+        index = copy.copy(self)
+        index.data = data
+        new_years, new_months = self._calendar(data['Date'].to_numpy()[new_start:])
+        index._years = np.concatenate([self._years[:new_start], new_years])
+        index._year_slices = self._merge(self._year_slices, self._partition(new_years), new_start)
+        index._year_month_slices = self._merge(
+            self._year_month_slices, self._month_slices(new_years * 100 + new_months), new_start
+        )
+        return index
+
+    @classmethod
+    def _month_slices(cls, keys):
+        return {(key // 100, key % 100): rows for key, rows in cls._partition(keys).items()}
+
+    # Slices of `slices` cut back to the first `offset` rows, then grown by `new_slices` (offset by `offset`)
+    @staticmethod
+    def _merge(slices, new_slices, offset):
+        merged = dict(slices)
+        # Slices are in row order, so only the last few can reach past `offset`
+        for key in reversed(list(merged)):
+            rows = merged[key]
+            if rows.stop <= offset:
+                break
+            if rows.start < offset:
+                merged[key] = slice(rows.start, offset)
+            else:
+                del merged[key]
+        for key, rows in new_slices.items():
+            start = merged[key].start if key in merged else rows.start + offset
+            merged[key] = slice(start, rows.stop + offset)
+        return merged
+
+    @staticmethod
+    def _partition(keys):
+        if len(keys) == 0:
+            return {}
+        starts = np.r_[0, np.flatnonzero(np.diff(keys)) + 1]
+        stops = np.r_[starts[1:], len(keys)]
+        return {int(keys[start]): slice(int(start), int(stop)) for start, stop in zip(starts, stops)}
+
+    def year_rows(self, year):
+        return self.data.iloc[self._year_slices.get(year, slice(0, 0))]
+
+    def month_rows(self, year, month):
+        return self.data.iloc[self._year_month_slices.get((year, month), slice(0, 0))]
+
+    # Rows with first_year <= year <= last_year
+    def range_rows(self, first_year, last_year):
+        start = np.searchsorted(self._years, first_year, side='left')
+        stop = np.searchsorted(self._years, last_year, side='right')
+        return self.data.iloc[start:stop]
+
+
+# Cumulative sums and non-null counts of every measure over the date-sorted frame, so the total or mean of
+# any date range is two lookups and a subtraction, whatever its span. Day-type filters get their own
+# cumulative arrays, built the first time they are asked for.
+class RangeSums:
+    def __init__(self, data, measures=CUBE_MEASURES):
+        dates = data['Date'].to_numpy()
+        if len(dates) > 1 and (dates[1:] < dates[:-1]).any():
+            raise ValueError("RangeSums needs the frame sorted by 'Date'")
+        self.measures = list(measures)
+        self._measure_pos = {measure: i for i, measure in enumerate(self.measures)}
+        self.data = data  # Read column by column when accumulating; no private copy of the (mapped) values
+        self.dates = dates
+        self._cumulative = {}
+
+    # Index for `data`, whose first `new_start` rows are the rows this one already covers; only the new
+    # rows are summed, continuing from the last cumulative value
+    def extended(self, data, new_start):
+        ranges = copy.copy(self)
+        ranges.data = data
+        ranges.dates = data['Date'].to_numpy()
+        ranges._cumulative = {}
+        for day_type, (sums, counts) in self._cumulative.items():
+            new_sums, new_counts = ranges._accumulate(day_type, new_start)
+            ranges._cumulative[day_type] = (
+                np.concatenate([sums, sums[:, -1:] + new_sums[:, 1:]], axis=1),
+                np.concatenate([counts, counts[:, -1:] + new_counts[:, 1:]], axis=1),
+            )
+        return ranges
+
+    # Cumulative (sums, counts) of rows from `start` on, with a leading zero column: (measures, rows + 1)
+    def _accumulate(self, day_type, start=0):
+        rows = self.data.iloc[start:]
+        if day_type in DAY_TYPE_MASKS:
+            mask = rows[DAY_TYPE_MASKS[day_type]].to_numpy()  # The frame's precomputed day-type mask
+        elif day_type == 'Total':
+            mask = None
+        else:
+            raise ValueError(f"Unknown day type {day_type!r}; expected one of {DAY_TYPES}")
+        sums = np.zeros((len(self.measures), len(rows) + 1))
+        counts = np.zeros((len(self.measures), len(rows) + 1), dtype=np.int64)
+        for i, measure in enumerate(self.measures):
+            values = rows[measure].to_numpy(dtype=np.float64)
+            present = ~np.isnan(values)
+            if mask is not None:
+                present &= mask
+            np.cumsum(np.where(present, values, 0.0), out=sums[i, 1:])
+            np.cumsum(present, out=counts[i, 1:])
+        return sums, counts
+
+    def _arrays(self, day_type):
+        arrays = self._cumulative.get(day_type)
+        if arrays is None:
+            arrays = self._cumulative[day_type] = self._accumulate(day_type)
+        return arrays
+
+    # Row positions [lo, hi) of the days from start to end, both inclusive
+    def _bounds(self, start, end):
+        lo = np.searchsorted(self.dates, np.datetime64(start).astype(self.dates.dtype), side='left')
+        hi = np.searchsorted(self.dates, np.datetime64(end).astype(self.dates.dtype), side='right')
+        return lo, max(lo, hi)
+
+    # {measure: {'total', 'days', 'mean'}} over start..end (inclusive), optionally only one day type
+    def query(self, start, end, measures, day_type='Total'):
+        sums, counts = self._arrays(day_type)
+        lo, hi = self._bounds(start, end)
+        result = {}
+        for measure in measures:
+            i = self._measure_pos[measure]
+            total = float(sums[i, hi] - sums[i, lo])
+            days = int(counts[i, hi] - counts[i, lo])
+            result[measure] = {'total': total, 'days': days, 'mean': total / days if days else None}
+        return result
@@ -0,0 +1,77 @@
+import flask
+import pandas as pd
+
+from mta_aggregates import DAY_TYPES
+from mta_data import segments
+from mta_dataset import current_dataset
+
+# Modes the API answers for: every segment plus their sum
+API_MODES = segments + ['Total Ridership']
+
+
+class BadRequest(ValueError):
+    pass
+
+
+def _date(args, name, default):
+    value = args.get(name)
+    if not value:
+        return default
+    try:
+        date = pd.Timestamp(value)
+    except ValueError:
+        raise BadRequest(f"{name} must be a date like 2024-01-31, got {value!r}")
+    if pd.isna(date):
+        raise BadRequest(f"{name} must be a date like 2024-01-31, got {value!r}")
+    # The data's dates are naive, so an offset like 2024-01-01T00:00Z is taken as that UTC time
+    return date.tz_convert(None) if date.tzinfo is not None else date
+
+
+# Totals and means of the selected modes over an inclusive date range, answered from the dataset's
+# cumulative sums (two lookups per mode, whatever the span):
+#   /api/ridership?start=2024-01-01&end=2024-03-31&modes=Subways,Buses&day_type=Weekday
+# start/end default to the first/last day of the data, modes to all of API_MODES, day_type to Total.
+def ridership_summary(ds, args):
+    dates = ds.data['Date']
+    start = _date(args, 'start', dates.iloc[0] if len(dates) else pd.Timestamp.min)
+    end = _date(args, 'end', dates.iloc[-1] if len(dates) else pd.Timestamp.max)
+    if start > end:
+        raise BadRequest(f"start {start:%Y-%m-%d} is after end {end:%Y-%m-%d}")
+
+    modes = [mode.strip() for mode in args.get('modes', '').split(',') if mode.strip()] or API_MODES
+    unknown = [mode for mode in modes if mode not in API_MODES]
+    if unknown:
+        raise BadRequest(f"Unknown modes {unknown}; expected any of {API_MODES}")
+
+    day_type = args.get('day_type') or 'Total'
+    if day_type not in DAY_TYPES:
+        raise BadRequest(f"Unknown day_type {day_type!r}; expected one of {DAY_TYPES}")
+
+    percent_columns = [f'{mode} %' for mode in modes if mode in segments]
+    sums = ds.ranges.query(start, end, modes + percent_columns, day_type)
+    result = {}
+    for mode in modes:
+        percent = sums.get(f'{mode} %')
+        result[mode] = {
+            'total': sums[mode]['total'],
+            'days': sums[mode]['days'],
+            'mean_daily': sums[mode]['mean'],
+            'mean_pct_of_pre_pandemic': percent['mean'] if percent else None,
+        }
+    return {
+        'start': f"{start:%Y-%m-%d}",
+        'end': f"{end:%Y-%m-%d}",
+        'day_type': day_type,
+        'version': ds.version,
+        'modes': result,
+    }
+
+
+# Serve the range API from the dashboard's Flask server, against whichever dataset is current
+def add_api_routes(server):
+    @server.route('/api/ridership')
+    def ridership_api():
+        try:
+            return flask.jsonify(ridership_summary(current_dataset(), flask.request.args))
+        except BadRequest as exc:
+            return flask.jsonify({'error': str(exc)}), 400
@@ -0,0 +1,342 @@
+import argparse
+import hashlib
+import json
+import mmap
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from mta_profile import profiler
+
+# Raw daily ridership feed (a URL or a local path)
+DATA_URL = os.environ.get(
+    'MTA_DATA_URL',
+    "https://raw.githubusercontent.com/plotly/datasets/master/MTA_Ridership_by_DATA_NY_GOV.csv"
+)
+
+# Local columnar snapshot of the prepared frame (set MTA_SNAPSHOT_PATH to '' to disable it)
+SNAPSHOT_PATH = os.environ.get(
+    'MTA_SNAPSHOT_PATH',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'snapshot', 'mta_ridership.snap')
+)
+
+# Serve the prepared columns straight from the snapshot's read-only memory map, so gunicorn workers
+# share one copy through the page cache instead of each holding a private frame
+SHARED_DATA = os.environ.get('MTA_SHARED_DATA', '') not in ('', '0')
+
+# Treat the feed as a large fine-grained file (e.g. per station and hour) and fold it into daily rows in chunks
+STREAM_INGEST = os.environ.get('MTA_STREAM_INGEST', '') not in ('', '0')
+
+# Bump whenever prepare_data() changes the columns it produces so stale snapshots get rebuilt
+SNAPSHOT_VERSION = 4
+SNAPSHOT_MAGIC = b'MTASNAP\x00'
+SNAPSHOT_ALIGN = 64  # Every column starts on a 64-byte boundary so it can be viewed straight from the mmap
+
+# Rename columns for simplicity
+RENAME_COLUMNS = {
+    'Subways: Total Estimated Ridership': 'Subways',
+    'Buses: Total Estimated Ridership': 'Buses',
+    'LIRR: Total Estimated Ridership': 'LIRR',
+    'Metro-North: Total Estimated Ridership': 'Metro-North',
+    'Access-A-Ride: Total Scheduled Trips': 'Access-A-Ride',
+    'Bridges and Tunnels: Total Traffic': 'Bridges and Tunnels',
+    'Staten Island Railway: Total Estimated Ridership': 'Staten Island Railway',
+    'Subways: % of Comparable Pre-Pandemic Day': 'Subways %',
+    'Buses: % of Comparable Pre-Pandemic Day': 'Buses %',
+    'LIRR: % of Comparable Pre-Pandemic Day': 'LIRR %',
+    'Metro-North: % of Comparable Pre-Pandemic Day': 'Metro-North %',
+    'Access-A-Ride: % of Comparable Pre-Pandemic Day': 'Access-A-Ride %',
+    'Bridges and Tunnels: % of Comparable Pre-Pandemic Day': 'Bridges and Tunnels %',
+    'Staten Island Railway: % of Comparable Pre-Pandemic Day': 'Staten Island Railway %'
+}
+
+segments = ['Subways', 'Buses', 'LIRR', 'Metro-North', 'Access-A-Ride', 'Bridges and Tunnels', 'Staten Island Railway']
+
+# Weekday positions follow pandas' Date.dt.weekday (Monday == 0)
+WEEKDAYS = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+
+# Ridership counts: whole numbers, NaN where the feed has a gap
+COUNT_COLUMNS = segments + ['Total Ridership']
+
+# Day-type filter -> the precomputed boolean mask column that selects it
+DAY_TYPE_MASKS = {'Weekday': 'Is Weekday', 'Weekend': 'Is Weekend', 'Sunday': 'Is Sunday'}
+
+# One dtype per column whatever a given frame holds, so frames prepared from different slices of the feed
+# (history with gaps, a refresh batch without) concatenate without upcasting. Counts are float32 so a gap
+# can be NaN; daily counts stay below 2**24, up to which float32 holds whole numbers exactly.
+COLUMN_DTYPES = {
+    'Year': np.int16,
+    'Month': np.int8,
+    'Day of Week': np.int8,
+    **{column: np.float32 for column in COUNT_COLUMNS},
+    **{f'{segment} %': np.float32 for segment in segments},
+}
+
+
+# Turn the raw CSV frame into the frame the dashboard works with
+def prepare_data(data):
+    # Convert 'Date' column to datetime format and extract month, year, and day of the week
+    with profiler.phase('date conversion'):
+        data['Date'] = pd.to_datetime(data['Date'])
+    data['Year'] = data['Date'].dt.year
+    data['Month'] = data['Date'].dt.month
+    data['Day of Week'] = data['Date'].dt.weekday
+    data['Day'] = pd.Categorical.from_codes(data['Day of Week'], WEEKDAYS)
+
+    # Day-type masks, so weekday/weekend/Sunday filters are boolean lookups instead of string compares
+    data['Is Weekday'] = data['Day of Week'] < 5
+    data['Is Weekend'] = data['Day of Week'] >= 5
+    data['Is Sunday'] = data['Day of Week'] == 6
+
+    data.rename(columns=RENAME_COLUMNS, inplace=True)
+
+    # Calculate total ridership by summing all relevant columns
+    data['Total Ridership'] = sum(data[segment] for segment in segments)
+
+    # Keep rows in date order so every year (and year-month) is one contiguous block of rows
+    data.sort_values('Date', inplace=True, ignore_index=True)
+    return compact_data(data)
+
+
+# Small fixed dtypes for every column (see COLUMN_DTYPES)
+def compact_data(data):
+    return data.astype(COLUMN_DTYPES)
+
+
+# Per-column and total memory of two versions of the frame, e.g. the default dtypes vs compact_data()
+def memory_report(before, after):
+    before_bytes = before.memory_usage(index=False, deep=True)
+    after_bytes = after.memory_usage(index=False, deep=True)
+    lines = [f"{'column':<26}{'before':>12}{'after':>12}"]
+    for name in before_bytes.index.union(after_bytes.index, sort=False):
+        lines.append(f"{name:<26}{before_bytes.get(name, 0):>12,}{after_bytes.get(name, 0):>12,}")
+    total_before, total_after = before_bytes.sum(), after_bytes.sum()
+    lines.append(f"{'total':<26}{total_before:>12,}{total_after:>12,}  ({total_before / max(total_after, 1):.1f}x smaller)")
+    return '\n'.join(lines)
+
+
+# Identifies a loaded dataset so caches can tell when the data underneath them has changed
+def dataset_version(data):
+    if len(data) == 0:
+        return '0'
+    return f"{len(data)}:{data['Date'].iloc[-1]:%Y-%m-%d}"
+
+
+# Hash of every value in the frame. Unlike dataset_version it changes when history is revised in place, for
+# caches that outlive the process.
+def dataset_digest(data):
+    digest = hashlib.sha1()
+    for name in data.columns:
+        values = data[name].array
+        if isinstance(values, pd.Categorical):
+            digest.update(json.dumps([str(category) for category in values.categories]).encode())
+            values = values.codes
+        else:
+            values = values.to_numpy()
+        digest.update(name.encode())
+        digest.update(np.ascontiguousarray(values).view(np.uint8))
+    return digest.hexdigest()[:16]
+
+
+def _pad(length):
+    return (-length) % SNAPSHOT_ALIGN
+
+
+# Write the prepared frame as: magic, header length, JSON header (schema + version), aligned column buffers
+def write_snapshot(data, path, source=None):
+    columns = []
+    buffers = []
+    for name in data.columns:
+        column = data[name]
+        entry = {'name': name}
+        if isinstance(column.dtype, np.dtype) and column.dtype.kind in 'biufM':
+            values = np.ascontiguousarray(column.to_numpy())
+        elif isinstance(column.dtype, pd.CategoricalDtype):
+            values = np.ascontiguousarray(column.cat.codes.to_numpy())
+            entry['categories'] = [str(category) for category in column.cat.categories]
+        else:
+            # Strings (e.g. 'Day') are stored as small-int codes plus the category list in the header
+            codes, categories = pd.factorize(column)
+            values = codes.astype(np.int8 if len(categories) < 128 else np.int32)
+            entry['categories'] = [str(category) for category in categories]
+        entry['dtype'] = values.dtype.str
+        entry['nbytes'] = values.nbytes
+        columns.append(entry)
+        buffers.append(values)
+
+    header = {
+        'version': SNAPSHOT_VERSION,
+        'rows': len(data),
+        'dataset': dataset_version(data),
+        'source': source,
+        'created': time.time(),
+        'columns': columns,
+    }
+    # Offsets depend on the header size, so lay the file out with a generous fixed guess and retry if it grows
+    header_size = 4096
+    while True:
+        offset = len(SNAPSHOT_MAGIC) + 8 + header_size
+        for entry in columns:
+            entry['offset'] = offset
+            offset += entry['nbytes'] + _pad(entry['nbytes'])
+        encoded = json.dumps(header).encode('utf-8')
+        if len(encoded) <= header_size:
+            break
+        header_size = len(encoded) + _pad(len(encoded))
+
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    # Write next to the target and rename so concurrently booting workers never see a half-written file
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(SNAPSHOT_MAGIC)
+        f.write(header_size.to_bytes(8, 'little'))
+        f.write(encoded.ljust(header_size, b' '))
+        for values in buffers:
+            f.write(values.tobytes())
+            f.write(b'\x00' * _pad(values.nbytes))
+    os.replace(tmp_path, path)
+
+
+def read_snapshot_header(path):
+    with open(path, 'rb') as f:
+        if f.read(len(SNAPSHOT_MAGIC)) != SNAPSHOT_MAGIC:
+            raise ValueError(f"{path} is not a ridership snapshot")
+        header_size = int.from_bytes(f.read(8), 'little')
+        header = json.loads(f.read(header_size))
+    if header.get('version') != SNAPSHOT_VERSION:
+        raise ValueError(f"snapshot version {header.get('version')} does not match {SNAPSHOT_VERSION}")
+    return header
+
+
+# Load the prepared frame back from a snapshot; column buffers are views on a read-only memory map. With
+# `source`, a snapshot built from any other feed is refused (ValueError) so the caller rebuilds it.
+def read_snapshot(path, source=None):
+    header = read_snapshot_header(path)
+    if source is not None and header.get('source') != source:
+        raise ValueError(f"snapshot was built from {header.get('source')!r}, not {source!r}")
+    for entry in header['columns']:
+        expected = COLUMN_DTYPES.get(entry['name'])
+        if expected is not None and np.dtype(entry['dtype']) != np.dtype(expected):
+            raise ValueError(f"snapshot column {entry['name']!r} is {entry['dtype']}, expected {np.dtype(expected).str}")
+    buffer = np.memmap(path, dtype=np.uint8, mode='r')
+    columns = {}
+    for entry in header['columns']:
+        values = buffer[entry['offset']:entry['offset'] + entry['nbytes']].view(np.dtype(entry['dtype']))
+        if len(values) != header['rows']:
+            raise ValueError(f"snapshot column {entry['name']!r} is truncated")
+        if 'categories' in entry:
+            # Categorical keeps the mapped codes as-is, so string columns stay shared too
+            values = pd.Categorical.from_codes(values, entry['categories'])
+        columns[entry['name']] = values
+    return pd.DataFrame(columns, copy=False)
+
+
+# Load the prepared frame, preferring the local snapshot and only hitting the network to (re)build it
+def load_data(source=DATA_URL, snapshot_path=SNAPSHOT_PATH, rebuild=False, shared=SHARED_DATA):
+    if snapshot_path and not rebuild:
+        try:
+            with profiler.phase('snapshot read'):
+                return read_snapshot(snapshot_path, source=source)
+        except (OSError, ValueError) as exc:
+            print(f"Snapshot unavailable ({exc}), rebuilding from {source}")
+
+    if STREAM_INGEST:
+        from mta_stream import stream_daily  # mta_stream builds on this module
+        with profiler.phase('stream feed into daily rows'):
+            raw, stats = stream_daily(source)
+        print(f"Streamed {stats['rows']:,} feed rows into {stats['days']:,} days ({stats['rows_per_sec']:,.0f} rows/sec)")
+    else:
+        with profiler.phase('csv download + parse'):
+            raw = pd.read_csv(source)
+
+    with profiler.phase('prepare data'):
+        data = prepare_data(raw)
+    if snapshot_path:
+        try:
+            with profiler.phase('snapshot write'):
+                write_snapshot(data, snapshot_path, source=source)
+        except OSError as exc:
+            print(f"Could not write snapshot {snapshot_path}: {exc}")
+        else:
+            if shared:
+                # Swap the freshly parsed (private) frame for the mapped one we just wrote
+                with profiler.phase('snapshot read'):
+                    return read_snapshot(snapshot_path)
+    return data
+
+
+def _is_mapped(values):
+    while values is not None:
+        if isinstance(values, mmap.mmap):
+            return True
+        values = getattr(values, 'base', None)
+    return False
+
+
+# Bytes of column data that live in the snapshot's memory map rather than in private process memory
+def mapped_nbytes(data):
+    mapped = 0
+    for name in data.columns:
+        values = data[name].array
+        values = values.codes if isinstance(values, pd.Categorical) else values.to_numpy()
+        if _is_mapped(values):
+            mapped += values.nbytes
+    return mapped
+
+
+# One line for the startup log on how much each worker saves by sharing the mapped columns
+def shared_memory_report(data, snapshot_path=SNAPSHOT_PATH):
+    total = int(data.memory_usage(index=False, deep=True).sum())
+    mapped = mapped_nbytes(data)
+    if not mapped:
+        return f"Shared data requested but no columns are memory-mapped (snapshot {snapshot_path!r}); workers hold private copies"
+    return (
+        f"Shared data: {mapped:,} of {total:,} column bytes memory-mapped read-only from {snapshot_path}; "
+        f"each worker saves ~{mapped:,} resident bytes (pid {os.getpid()})"
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Manage the local MTA ridership snapshot and callback result cache")
+    parser.add_argument('command', choices=['rebuild', 'info', 'memory', 'cache'])
+    parser.add_argument('--source', default=DATA_URL, help="CSV URL or path to build the snapshot from")
+    parser.add_argument('--snapshot', default=SNAPSHOT_PATH, help="Snapshot file to write or inspect")
+    parser.add_argument('--clear', action='store_true', help="With 'cache': drop every stored callback response")
+    args = parser.parse_args(argv)
+
+    if args.command == 'rebuild':
+        start = time.perf_counter()
+        data = load_data(source=args.source, snapshot_path=args.snapshot, rebuild=True)
+        print(f"Wrote {len(data):,} rows to {args.snapshot} in {time.perf_counter() - start:.2f}s")
+    elif args.command == 'memory':
+        # The frame as the dashboard used to hold it (default dtypes, a Python string per 'Day') vs compact
+        raw = pd.read_csv(args.source)
+        before = raw.rename(columns=RENAME_COLUMNS)
+        before['Date'] = pd.to_datetime(before['Date'])
+        before['Year'] = before['Date'].dt.year.astype(np.int64)
+        before['Month'] = before['Date'].dt.month.astype(np.int64)
+        before['Day'] = before['Date'].dt.day_name().astype(object)
+        before['Total Ridership'] = sum(before[segment] for segment in segments)
+        print(memory_report(before, prepare_data(raw)))
+    elif args.command == 'cache':
+        from mta_result_cache import RESULT_CACHE_PATH, ResultCache  # mta_result_cache builds on this module
+        if not RESULT_CACHE_PATH:
+            parser.error("the result cache is turned off (MTA_RESULT_CACHE is empty)")
+        cache = ResultCache()
+        if args.clear:
+            cache.clear()
+        stats = cache.stats()
+        print(f"{RESULT_CACHE_PATH}: {stats['entries']:,} responses, {stats['bytes'] / 2**20:,.1f} MiB")
+    else:
+        header = read_snapshot_header(args.snapshot)
+        print(f"{args.snapshot}: version {header['version']}, {header['rows']:,} rows, source {header['source']}")
+        for entry in header['columns']:
+            print(f"  {entry['name']}: {entry['dtype']} ({entry['nbytes']:,} bytes)")
+
+
+if __name__ == '__main__':
+    main()
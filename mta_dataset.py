@@ -0,0 +1,235 @@
+import functools
+import os
+import threading
+
+try:
+    import fcntl  # POSIX only: elsewhere every process refreshes on its own
+except ImportError:
+    fcntl = None
+
+import pandas as pd
+from pandas.api.types import CategoricalDtype
+
+from mta_aggregates import AggregateCube, RangeSums
+from mta_data import (
+    DATA_URL, SHARED_DATA, SNAPSHOT_PATH, STREAM_INGEST, dataset_digest, dataset_version, prepare_data, read_snapshot,
+    read_snapshot_header, write_snapshot
+)
+from mta_sql import SqlCube
+from mta_stream import stream_daily
+from mta_trends import TrendSeries, YearOverlay
+
+# Seconds between checks of the data feed for new days; 0 turns the background refresher off
+REFRESH_INTERVAL = float(os.environ.get('MTA_REFRESH_INTERVAL', '0'))
+
+# Which store answers the KPI and summary aggregates: 'cube' (in-memory numpy arrays) or 'sqlite' (indexed
+# SQL over an on-disk store shared by every process, see mta_sql)
+QUERY_BACKEND = os.environ.get('MTA_QUERY_BACKEND', 'cube')
+
+# Feed rows parsed per chunk while looking for new days
+REFRESH_CHUNK_ROWS = 1000
+
+
+# Immutable bundle of the prepared frame and everything derived from it. A callback takes the current
+# Dataset once and reads only from it, so a refresh swapping in a newer one mid-request can't mix versions.
+class Dataset:
+    def __init__(self, data, cube=None, ranges=None, trends=None, overlay=None):
+        self.data = data
+        self.cube = cube if cube is not None else build_cube(data)
+        self.ranges = ranges if ranges is not None else RangeSums(data)
+        # Smoothed and weekly/monthly chart series and the year overlay matrix; a refresh extends them
+        self.trends = trends if trends is not None else TrendSeries(data)
+        self.rows = self.trends.rows['daily']  # Year and year-month row slices of `data`
+        self.overlay = overlay if overlay is not None else YearOverlay(data)
+        self.version = dataset_version(data)
+        self.years = self.cube.years
+
+    # Dataset for `data`, whose first `start` rows are this one's; every index is extended by the new rows
+    # rather than rebuilt from the whole history
+    def extended(self, data, start):
+        return Dataset(
+            data, self.cube.extended(data.iloc[start:]), self.ranges.extended(data, start),
+            self.trends.extended(data, start), self.overlay.extended(data, start)
+        )
+
+    # The version plus a hash of every value, for caches shared across processes and restarts; hashed on
+    # first use, since the in-process caches only need `version`
+    @functools.cached_property
+    def content_version(self):
+        return f"{self.version}:{dataset_digest(self.data)}"
+
+
+def build_cube(data):
+    if QUERY_BACKEND == 'sqlite':
+        return SqlCube(data)
+    if QUERY_BACKEND != 'cube':
+        raise ValueError(f"MTA_QUERY_BACKEND must be 'cube' or 'sqlite', got {QUERY_BACKEND!r}")
+    return AggregateCube(data)
+
+
+_current = None
+
+
+def current_dataset():
+    return _current
+
+
+# Publish a new Dataset; rebinding one global is atomic, so readers see the old bundle or the new one
+def swap_dataset(dataset):
+    global _current
+    _current = dataset
+
+
+# Raw feed rows dated after `last_date`. The feed is parsed in chunks, and for newest-first feeds (like the
+# MTA export) reading stops at the first chunk that reaches known days, so only the head of the file is parsed.
+def read_new_rows(source, last_date, chunk_rows=REFRESH_CHUNK_ROWS):
+    new_chunks = []
+    with pd.read_csv(source, chunksize=chunk_rows) as reader:
+        for chunk in reader:
+            dates = pd.to_datetime(chunk['Date'])
+            is_new = (dates > last_date).to_numpy() if last_date is not None else None
+            new_chunks.append(chunk if is_new is None else chunk[is_new])
+            if is_new is not None and not is_new.all() and dates.iloc[0] >= dates.iloc[-1]:
+                break
+    if not new_chunks:
+        return pd.DataFrame()
+    return pd.concat(new_chunks, ignore_index=True)
+
+
+# Append prepared rows to the frame, keeping categorical columns categorical
+def _append_rows(data, new_rows):
+    for name, dtype in data.dtypes.items():
+        if isinstance(dtype, CategoricalDtype) and name in new_rows:
+            categories = dtype.categories.union(pd.Index(new_rows[name].unique()), sort=False)
+            if len(categories) != len(dtype.categories):
+                data = data.assign(**{name: data[name].cat.set_categories(categories)})
+            new_rows[name] = pd.Categorical(new_rows[name], categories=categories)
+    return pd.concat([data, new_rows], ignore_index=True)
+
+
+# Background refresher: appends only the days the feed has beyond the current Dataset, extends the cube and
+# range sums by those rows, then swaps in the new Dataset. With MTA_STREAM_INGEST the feed is fine-grained
+# (e.g. per station and hour) and its new rows are folded into days first, as load_data() does.
+#
+# With a snapshot, one process on the host does the fetching: whichever holds the snapshot's lock file
+# appends the new days and rewrites the snapshot, and every other worker only notices the new file and
+# re-maps it, so they keep sharing one copy of the columns. refresh_once() can be driven directly against a
+# local file or a local HTTP server.
+class Refresher:
+    def __init__(self, source=DATA_URL, interval=REFRESH_INTERVAL, snapshot_path=SNAPSHOT_PATH, shared=SHARED_DATA):
+        self.source = source
+        self.interval = interval
+        self.snapshot_path = snapshot_path
+        self.shared = shared
+        self._refresh_lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._pid = None
+        self._stop = None
+        self._thread = None
+        self._snapshot_stamp = None
+
+    # Returns the number of rows added
+    def refresh_once(self):
+        with self._refresh_lock:
+            if not self.snapshot_path or fcntl is None:
+                return self._fetch_new_rows()
+            os.makedirs(os.path.dirname(self.snapshot_path) or '.', exist_ok=True)
+            with open(f"{self.snapshot_path}.lock", 'a') as lock:
+                try:
+                    fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    # Another process is refreshing; pick up what it last wrote
+                    return self._adopt_snapshot()
+                try:
+                    # Start from the newest snapshot, which another process may have written since our last turn
+                    adopted = self._adopt_snapshot()
+                    return adopted + self._fetch_new_rows()
+                finally:
+                    fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _stamp(self):
+        try:
+            stat = os.stat(self.snapshot_path)
+        except FileNotFoundError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+    # Swap in the snapshot file when another process has replaced it; returns the number of rows it added
+    def _adopt_snapshot(self):
+        stamp = self._stamp()
+        if stamp is None or stamp == self._snapshot_stamp:
+            return 0
+        current = current_dataset()
+        try:
+            if read_snapshot_header(self.snapshot_path).get('dataset') == current.version:
+                self._snapshot_stamp = stamp
+                return 0
+            data = read_snapshot(self.snapshot_path, source=self.source)
+        except (OSError, ValueError) as exc:
+            print(f"Could not read snapshot {self.snapshot_path}: {exc}")
+            return 0
+        self._snapshot_stamp = stamp
+        start = len(current.data)
+        if start and len(data) > start and data['Date'].iloc[start - 1] == current.data['Date'].iloc[-1]:
+            # The usual case: the same history with new days appended, so the indexes are extended
+            swap_dataset(current.extended(data, start))
+        else:
+            swap_dataset(Dataset(data))
+        return max(len(data) - start, 0)
+
+    def _fetch_new_rows(self):
+        current = current_dataset()
+        last_date = current.data['Date'].iloc[-1] if len(current.data) else None
+        if STREAM_INGEST:
+            new_raw, _ = stream_daily(self.source, after=last_date)
+        else:
+            new_raw = read_new_rows(self.source, last_date)
+        if new_raw.empty:
+            return 0
+
+        new_rows = prepare_data(new_raw)
+        data = _append_rows(current.data, new_rows)
+        if self.snapshot_path:
+            try:
+                write_snapshot(data, self.snapshot_path, source=self.source)
+            except OSError as exc:
+                print(f"Could not write snapshot {self.snapshot_path}: {exc}")
+            else:
+                self._snapshot_stamp = self._stamp()
+                if self.shared:
+                    data = read_snapshot(self.snapshot_path)
+
+        start = len(current.data)
+        swap_dataset(current.extended(data, start))
+        return len(new_rows)
+
+    def _run(self, stop):
+        while not stop.wait(self.interval):
+            try:
+                added = self.refresh_once()
+            except Exception as exc:
+                print(f"Dataset refresh from {self.source} failed: {exc}")
+            else:
+                if added:
+                    print(f"Dataset refreshed: {added} new rows, version {current_dataset().version}")
+
+    # Start the refresh thread in this process. Safe to call on every request: it only starts once per
+    # process, including once in each forked gunicorn worker (threads don't survive a fork).
+    def ensure_started(self):
+        if not self.interval or self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._stop = threading.Event()
+            self._thread = threading.Thread(target=self._run, args=(self._stop,), name='mta-refresher', daemon=True)
+            self._thread.start()
+
+    # Stop this process's refresh thread, waiting up to `timeout` seconds for a refresh in progress, so a
+    # worker doesn't exit halfway through rewriting the snapshot. Called from gunicorn's worker_exit hook.
+    def stop(self, timeout=None):
+        if self._pid != os.getpid():
+            return
+        self._stop.set()
+        self._thread.join(timeout)
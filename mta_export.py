@@ -0,0 +1,307 @@
+import argparse
+import hashlib
+import html
+import json
+import os
+import re
+import shutil
+import tempfile
+import time
+
+import dash
+import plotly
+from plotly.offline import get_plotlyjs
+
+from mta_images import IMAGE_DIR
+from mta_styles import STYLESHEET, STYLESHEET_NAME, css_declarations
+from mta_trends import GRANULARITIES
+
+VOID_TAGS = {'img', 'source', 'hr', 'br'}
+
+# Written into every export, so re-running only ever replaces a directory this exporter created
+EXPORT_MARKER = '.mta-static-export'
+
+# Plots every figure on the page and swaps figures when a granularity radio changes
+STATIC_JS = """\
+function plotFigure(graphId, url) {
+    fetch(url).then(function (response) { return response.json(); }).then(function (figure) {
+        Plotly.react(graphId, figure.data, figure.layout, {responsive: true});
+    });
+}
+document.addEventListener('DOMContentLoaded', function () {
+    document.querySelectorAll('[data-figure]').forEach(function (graph) {
+        plotFigure(graph.id, graph.dataset.figure);
+    });
+    document.querySelectorAll('input[data-graph]').forEach(function (radio) {
+        radio.addEventListener('change', function () { plotFigure(radio.dataset.graph, radio.value); });
+    });
+});
+"""
+
+PAGE_HTML = """\
+<!DOCTYPE html>
+<html lang="en">
+<head>
+<meta charset="utf-8">
+<title>{title}</title>
+<link rel="stylesheet" href="{root}{stylesheet}">
+<script src="{root}plotly.min.js"></script>
+<script src="{root}static.js"></script>
+</head>
+<body style="margin: 8px; font-family: sans-serif">
+{body}
+</body>
+</html>
+"""
+
+
+def slug(text):
+    return re.sub(r'[^a-z0-9]+', '-', text.lower()).strip('-')
+
+
+def _attrs(**attrs):
+    return ''.join(f' {name}="{html.escape(str(value))}"' for name, value in attrs.items() if value not in (None, ''))
+
+
+# Writes every page of the dashboard as static HTML. Callback outputs are computed up front with the app's
+# own callback functions and filled into the Dash layouts, and each Dash component is rendered as plain
+# HTML. Figures are written once each as JSON (named by content hash) and drawn by the shared plotly.js.
+class StaticExport:
+    def __init__(self, dash_app, out_dir):
+        self.app = dash_app
+        self.out_dir = out_dir
+        self.ds = dash_app.current_dataset()
+        self.figures = 0
+        self._in_paragraph = False
+
+    def figure_url(self, figure, root):
+        payload = json.dumps(figure, cls=plotly.utils.PlotlyJSONEncoder, separators=(',', ':'))
+        name = hashlib.sha1(payload.encode()).hexdigest()[:16] + '.json'
+        path = os.path.join(self.out_dir, 'figures', name)
+        if not os.path.exists(path):
+            with open(path, 'w') as f:
+                f.write(payload)
+            self.figures += 1
+        return f'{root}figures/{name}'
+
+    # Point the app's /assets/ URLs (vendored images) at the copy under the export root; a srcset may hold several
+    def asset_url(self, value, root):
+        if not value:
+            return value
+        prefix = self.app.app.get_asset_url('')
+        return ', '.join(
+            f"{root}assets/{url[len(prefix):]}" if url.startswith(prefix) else url for url in value.split(', ')
+        )
+
+    # HTML for a Dash component tree. `outputs` maps component id -> props that replace the layout's props
+    # (callback outputs, dropdown values); `nav` maps a dropdown id to {value: page url}; `variants` maps a
+    # granularity selector id to (graph id, {granularity: figure}).
+    def render(self, component, outputs, nav, variants, root):
+        if component is None:
+            return ''
+        if isinstance(component, (list, tuple)):
+            return ''.join(self.render(child, outputs, nav, variants, root) for child in component)
+        if not hasattr(component, 'to_plotly_json'):
+            return html.escape(str(component))
+
+        spec = component.to_plotly_json()
+        props = dict(spec['props'])
+        props.update(outputs.get(props.get('id'), {}))
+        kind = (spec['namespace'], spec['type'])
+        children = lambda: self.render(props.get('children'), outputs, nav, variants, root)
+
+        if kind[0] == 'dash_html_components':
+            tag = kind[1].lower()
+            attrs = _attrs(
+                id=props.get('id'), **{'class': props.get('className')}, style=css_declarations(props.get('style')),
+                src=self.asset_url(props.get('src'), root),
+                srcset=self.asset_url(props.get('srcSet'), root), sizes=props.get('sizes'), type=props.get('type'),
+                width=props.get('width'), height=props.get('height'), alt=props.get('alt'), href=props.get('href'),
+                target=props.get('target')
+            )
+            if tag in VOID_TAGS:
+                return f'<{tag}{attrs}>'
+            # React can put a <p> inside a <p> (the YoY lines do); an HTML parser would close the outer one
+            if tag == 'p' and self._in_paragraph:
+                tag = 'div'
+            outer, self._in_paragraph = self._in_paragraph, self._in_paragraph or tag == 'p'
+            content = children()
+            self._in_paragraph = outer
+            return f'<{tag}{attrs}>{content}</{tag}>'
+        if kind == ('dash_core_components', 'Graph'):
+            figure = props.get('figure')
+            if not figure:
+                return f'<div{_attrs(id=props["id"])}></div>'
+            return f'<div{_attrs(id=props["id"], **{"data-figure": self.figure_url(figure, root)})}></div>'
+        if kind == ('dash_core_components', 'Dropdown'):
+            options = ''.join(
+                f'<option{_attrs(value=nav[props["id"]][option["value"]])}'
+                f'{" selected" if option["value"] == props.get("value") else ""}>{html.escape(option["label"])}</option>'
+                for option in props['options']
+            )
+            return f'<select{_attrs(id=props["id"], style=css_declarations(props.get("style")))} onchange="location.href=this.value">{options}</select>'
+        if kind == ('dash_core_components', 'RadioItems'):
+            graph_id, figures = variants[props['id']]
+            return ''.join(
+                f'<label{_attrs(**{"class": props.get("labelClassName")}, style=css_declarations(props.get("labelStyle")))}><input type="radio"'
+                f'{_attrs(name=props["id"], value=self.figure_url(figures[option["value"]], root), **{"data-graph": graph_id})}'
+                f'{" checked" if option["value"] == props.get("value") else ""}>{html.escape(option["label"])}</label>'
+                for option in props['options']
+            )
+        if kind == ('dash_core_components', 'Link'):
+            attrs = _attrs(
+                id=props.get('id'), **{'class': props.get('className')}, href=nav['links'][props['href']], style=css_declarations(props.get('style'))
+            )
+            return f'<a{attrs}>{children()}</a>'
+        if kind == ('dash_table', 'DataTable'):
+            cell = css_declarations(props.get('style_cell'))
+            head = ''.join(f'<th{_attrs(style=cell)}>{html.escape(column["name"])}</th>' for column in props['columns'])
+            rows = ''.join(
+                '<tr>' + ''.join(f'<td{_attrs(style=cell)}>{html.escape(str(row[column["id"]]))}</td>' for column in props['columns']) + '</tr>'
+                for row in props.get('data') or []
+            )
+            return f'<table{_attrs(id=props.get("id"), style=css_declarations(props.get("style_table")))}><tr>{head}</tr>{rows}</table>'
+        return ''  # Location, Store: nothing to show once every output is precomputed
+
+    def write_page(self, relative_path, pathname, outputs, nav, variants, title):
+        depth = relative_path.count('/')
+        root = '../' * depth
+        links = {
+            '/about': f'{root}about.html',
+            '/overview': f'{root}overview/{self.ds.years[-1]}.html',
+            '/segment': f'{root}segment/{slug(self.app.transport_modes[0])}/{self.ds.years[-1]}.html',
+        }
+        link_classes = dict(zip(
+            ['about-link', 'overview-link', 'segment-link'],
+            [{'className': 'nav-link nav-link-active' if page == pathname else 'nav-link'} for page in links]
+        ))
+        page = self.app.pages.get(pathname, self.ds)
+        outputs = {**link_classes, **outputs}
+        nav = {**nav, 'links': links}
+        shell = self.app.app.layout
+        body = self.render(shell, {'page-content': {'children': page}, **outputs}, nav, variants, root)
+        path = os.path.join(self.out_dir, relative_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w') as f:
+            f.write(PAGE_HTML.format(title=html.escape(title), root=root, stylesheet=STYLESHEET_NAME, body=body))
+
+    def segment_kpis(self, table, mode, year):
+        kpis = table['modes'][mode]
+        i = table['years'].index(year)
+        if kpis['count'][i] == 0:
+            return ["No data available", "", "", ""]
+
+        # Same text and colours as the clientside KPI callback
+        def number(value, grouped):
+            return value if isinstance(value, str) else (f"{value:,.2f}" if grouped else f"{value:.2f}")
+
+        def increase(value):
+            return value == 'inf' if isinstance(value, str) else value >= 0
+
+        def yoy(text, up):
+            return dash.html.P(text, className='kpi-up' if up else 'kpi-down')
+
+        return [
+            f"{number(kpis['total'][i], True)}M",
+            yoy(f"YoY % Change: {number(kpis['yoy'][i], True)}%", increase(kpis['yoy'][i])),
+            f"{number(kpis['mean'][i], False)}%",
+            yoy(f"YoY Change: {number(kpis['meanDiff'][i], False)}%", increase(kpis['meanYoy'][i])),
+        ]
+
+    def run(self):
+        app, ds = self.app, self.ds
+        years = [int(year) for year in ds.years]
+        granularities = list(GRANULARITIES)
+        os.makedirs(os.path.join(self.out_dir, 'figures'), exist_ok=True)
+        with open(os.path.join(self.out_dir, 'plotly.min.js'), 'w') as f:
+            f.write(get_plotlyjs())
+        with open(os.path.join(self.out_dir, 'static.js'), 'w') as f:
+            f.write(STATIC_JS)
+        with open(os.path.join(self.out_dir, STYLESHEET_NAME), 'w') as f:
+            f.write(STYLESHEET)
+        if os.path.isdir(IMAGE_DIR):
+            shutil.copytree(IMAGE_DIR, os.path.join(self.out_dir, 'assets', 'img'))
+        with open(os.path.join(self.out_dir, 'index.html'), 'w') as f:
+            f.write('<!DOCTYPE html><meta http-equiv="refresh" content="0; url=about.html">\n')
+        pages = 0
+
+        self.write_page('about.html', '/about', {}, {}, {}, "About - MTA Ridership")
+        pages += 1
+
+        overview_figures = {granularity: app.overview_trend(ds, granularity) for granularity in granularities}
+        overview_nav = {'overview-year-dropdown': {year: f'{year}.html' for year in years}}
+        for year in years:
+            kpis = app.update_overview_kpis(year)
+            outputs = {
+                'overview-year-dropdown': {'value': year},
+                'overview-ridership-graph': {'figure': overview_figures['daily']},
+                **{output: {'children': value} for output, value in zip(
+                    ['Overview-kpi-card', 'Overview-kpi-yoy-diff', 'Overview-kpi-pre-pandemic', 'Overview-kpi-pre-pandemic-yoy'], kpis
+                )},
+            }
+            variants = {'overview-granularity': ('overview-ridership-graph', overview_figures)}
+            self.write_page(f'overview/{year}.html', '/overview', outputs, overview_nav, variants, f"Overview {year} - MTA Ridership")
+            pages += 1
+
+        kpi_table = ds.cube.kpi_table(app.transport_modes)
+        for mode in app.transport_modes:
+            trend_figures = {granularity: app.update_segment_trend(mode, granularity) for granularity in granularities}
+            overlay = app.update_yoy_overlay(mode)
+            summary = app.update_summary_table(mode)
+            for year in years:
+                nav = {
+                    'mode-dropdown': {other: f'../{slug(other)}/{year}.html' for other in app.transport_modes},
+                    'year-dropdown': {other: f'{other}.html' for other in years},
+                }
+                outputs = {
+                    'mode-dropdown': {'value': mode},
+                    'year-dropdown': {'value': year},
+                    'trend-graph': {'figure': trend_figures['daily']},
+                    'yoy-overlay-graph': {'figure': overlay},
+                    'ytd-comparison': {'children': app.update_ytd_comparison(mode, year)},
+                    'summary-table': {'data': summary},
+                    **{output: {'children': value} for output, value in zip(
+                        ['kpi-card', 'kpi-yoy-diff', 'kpi-pre-pandemic', 'kpi-pre-pandemic-yoy'], self.segment_kpis(kpi_table, mode, year)
+                    )},
+                }
+                variants = {'segment-granularity': ('trend-graph', trend_figures)}
+                self.write_page(f'segment/{slug(mode)}/{year}.html', '/segment', outputs, nav, variants, f"{mode} {year} - MTA Ridership")
+                pages += 1
+        return pages
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Write every dashboard page and dropdown combination as a static site")
+    parser.add_argument(
+        '--out', default='static_export', help="Output directory (replaced if it holds an earlier export; must not exist otherwise)"
+    )
+    args = parser.parse_args(argv)
+    out = os.path.abspath(args.out)
+    if os.path.exists(out) and not os.path.exists(os.path.join(out, EXPORT_MARKER)):
+        if not os.path.isdir(out) or os.listdir(out):
+            parser.error(f"{args.out} exists and is not an earlier export; choose another --out or remove it yourself")
+
+    start = time.perf_counter()
+    import dash_app  # Loads the dataset, exactly as the live app would
+    # Build next to the target and swap it in at the end, so a failed export leaves the previous one in place
+    build_dir = tempfile.mkdtemp(prefix='.mta-export-', dir=os.path.dirname(out))
+    try:
+        os.chmod(build_dir, 0o755)  # mkdtemp makes it private; the site is meant to be served
+        export = StaticExport(dash_app, build_dir)
+        pages = export.run()
+        open(os.path.join(build_dir, EXPORT_MARKER), 'w').close()
+        if os.path.isdir(out):
+            shutil.rmtree(out)
+        os.replace(build_dir, out)
+    except BaseException:
+        shutil.rmtree(build_dir, ignore_errors=True)
+        raise
+    print(
+        f"Wrote {pages} pages and {export.figures} figures to {args.out} in {time.perf_counter() - start:.1f}s "
+        f"(dataset version {export.ds.version}); serve it with any static file server, e.g. "
+        f"python -m http.server -d {args.out}"
+    )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,276 @@
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+import plotly.express as px
+
+from mta_data import segments
+from mta_trends import GRANULARITIES
+
+# Every figure the app caches: a Segment trend per mode and granularity, an Overview trend per granularity,
+# a year overlay per mode and the About chart. The default keeps them all, so cycling through the
+# dropdowns never evicts a figure that will be asked for again.
+FIGURE_KEYS = len(segments) * len(GRANULARITIES) + len(GRANULARITIES) + len(segments) + 1
+
+# How many finished figures each worker keeps around
+FIGURE_CACHE_SIZE = int(os.environ.get('MTA_FIGURE_CACHE_SIZE', FIGURE_KEYS))
+
+# Cap on points per trend trace; 0 sends every daily point
+TREND_MAX_POINTS = int(os.environ.get('MTA_TREND_MAX_POINTS', '0'))
+
+
+# Bounded LRU cache of finished figures, stored as plain dicts so Dash can serialize them without
+# rebuilding or re-validating a plotly Figure. Entries belong to one dataset version and are dropped
+# as soon as a different version is asked for.
+class FigureCache:
+    def __init__(self, maxsize=FIGURE_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.version = None
+        self.hits = 0
+        self.misses = 0
+        self._figures = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, build, version=None):
+        with self._lock:
+            if version != self.version:
+                self._figures.clear()
+                self.version = version
+            figure = self._figures.get(key)
+            if figure is not None:
+                self._figures.move_to_end(key)
+                self.hits += 1
+                return figure
+            self.misses += 1
+
+        # Build outside the lock; two worker threads racing on the same key just build it twice
+        figure = build().to_dict()
+        with self._lock:
+            if version == self.version:
+                self._figures[key] = figure
+                while len(self._figures) > self.maxsize:
+                    self._figures.popitem(last=False)
+        return figure
+
+    def clear(self):
+        with self._lock:
+            self._figures.clear()
+
+    def stats(self):
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'size': len(self._figures), 'maxsize': self.maxsize}
+
+
+# Largest-triangle-three-buckets: indices of at most n_out points that keep the visual shape of (x, y).
+# The first and last points are always kept; every bucket in between contributes the point forming the
+# largest triangle with the previously chosen point and the average of the next bucket.
+def lttb_indices(x, y, n_out):
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+
+    # n_out - 2 buckets over the interior points; edges[i]:edges[i + 1] is bucket i
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    valid = ~np.isnan(y)
+    counts = np.add.reduceat(valid[:n - 1], edges[:-1])
+    with np.errstate(invalid='ignore', divide='ignore'):
+        avg_x = np.add.reduceat(x[:n - 1], edges[:-1]) / np.diff(edges)
+        avg_y = np.add.reduceat(np.where(valid, y, 0.0)[:n - 1], edges[:-1]) / counts
+    # The third vertex for bucket i is the average of bucket i + 1 (the last point for the final bucket)
+    avg_x = np.r_[avg_x[1:], x[-1]]
+    avg_y = np.r_[avg_y[1:], y[-1]]
+
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        area = np.abs((x[a] - avg_x[i]) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y[i] - y[a]))
+        a = lo + int(np.argmax(np.where(np.isnan(area), -1.0, area)))
+        selected[i + 1] = a
+    return selected
+
+
+# Downsample a date-sorted frame to max_points rows for plotting `column` against 'Date'
+def downsample(frame, column, max_points=TREND_MAX_POINTS):
+    if not max_points or len(frame) <= max_points:
+        return frame
+    x = frame['Date'].to_numpy().astype('datetime64[ns]').astype(np.int64)
+    return frame.iloc[lttb_indices(x, frame[column].to_numpy(dtype=np.float64), max_points)]
+
+
+# True when a Graph's relayoutData is a zoom/pan/reset of the x-axis (and not e.g. an autosize)
+def is_zoom_event(relayout_data):
+    return bool(relayout_data) and any(key.startswith('xaxis.range') or key == 'xaxis.autorange' for key in relayout_data)
+
+
+# The visible (start, end) dates from relayoutData, or None when the chart shows its full range
+def zoom_window(relayout_data):
+    if not relayout_data:
+        return None
+    if 'xaxis.range[0]' in relayout_data:
+        start, end = relayout_data['xaxis.range[0]'], relayout_data['xaxis.range[1]']
+    elif 'xaxis.range' in relayout_data:
+        start, end = relayout_data['xaxis.range']
+    else:
+        return None
+    return pd.Timestamp(start), pd.Timestamp(end)
+
+
+# Rows of a date-sorted frame inside [start, end]
+def window_rows(frame, start, end):
+    dates = frame['Date'].to_numpy()
+    lo = np.searchsorted(dates, np.datetime64(start), side='left')
+    hi = np.searchsorted(dates, np.datetime64(end), side='right')
+    return frame.iloc[lo:hi]
+
+
+# Line chart of total ridership for the Overview page; `label` names a smoothed or coarser series
+def overview_trend_figure(trend_data, first_year, last_year, label='Daily'):
+    series = '' if label == 'Daily' else f' {label}'
+    fig = px.line(trend_data, x='Date', y='Total Ridership', title=f"Total Ridership{series} Trend ({first_year} - {last_year})")
+    fig.update_layout(uirevision='overview')  # Keep the user's zoom when a re-resolved figure comes back
+    return fig
+
+
+# Line chart for the ridership trend of one mode on the Segment page (daily, or the series `label` names)
+def segment_trend_figure(trend_data, selected_mode, first_year, last_year, label='Daily'):
+    trend_fig = px.line(
+        trend_data,
+        x='Date',
+        y=selected_mode,
+        title=f'{selected_mode} {label} Ridership Trend ({first_year}-{last_year})',
+        labels={'Date': 'Date', selected_mode: 'Estimated Ridership'}
+    )
+    trend_fig.update_layout(
+        plot_bgcolor='white',
+        paper_bgcolor='white',
+        xaxis_title='Date',
+        yaxis_title='Ridership',
+        xaxis=dict(
+            rangeslider=dict(visible=False),
+            showline=True,
+            showgrid=True,
+            gridcolor='lightgrey',
+            tickfont=dict(color='black')
+        ),
+        yaxis=dict(
+            showgrid=True,
+            gridcolor='lightgrey',
+            tickfont=dict(color='black')
+        ),
+        title_font=dict(color='black'),
+        font=dict(color='black'),
+        uirevision=selected_mode  # Keep the user's zoom until the mode changes
+    )
+    return trend_fig
+
+
+# Segment page overlay: one line per year of `matrix` (years x weekday-aligned calendar days, see YearOverlay)
+def yoy_overlay_figure(years, matrix, selected_mode):
+    days = matrix.shape[1]
+    overlay_data = pd.DataFrame({
+        'Week': np.tile(np.arange(days) / 7 + 1, len(years)),
+        'Year': np.repeat([str(year) for year in years], days),
+        selected_mode: matrix.ravel(),
+    }).dropna()
+    fig = px.line(
+        overlay_data,
+        x='Week',
+        y=selected_mode,
+        color='Year',
+        title=f'{selected_mode} Ridership by Week of Year (weekday-aligned)',
+        labels={'Week': 'Week of year', selected_mode: 'Estimated Ridership'}
+    )
+    fig.update_layout(
+        plot_bgcolor='white',
+        paper_bgcolor='white',
+        xaxis=dict(showgrid=True, gridcolor='lightgrey', tickfont=dict(color='black')),
+        yaxis=dict(showgrid=True, gridcolor='lightgrey', tickfont=dict(color='black')),
+        font=dict(color='black'),
+        uirevision=selected_mode
+    )
+    return fig
+
+
+# About page bar chart: each mode's share of total ridership in 2020 and 2024
+def mode_share_figure(cube):
+    # Calculate percentage for 2020
+    data_2020_percent = {segment: (cube.total(segment, 2020) / cube.total('Total Ridership', 2020)) * 100 for segment in segments}
+
+    # Calculate percentage for 2024
+    data_2024_percent = {segment: (cube.total(segment, 2024) / cube.total('Total Ridership', 2024)) * 100 for segment in segments}
+
+    # Prepare data for the bar chart
+    chart_data_2020 = pd.DataFrame(list(data_2020_percent.items()), columns=['Transport Mode', '2020 Percentage'])
+    chart_data_2024 = pd.DataFrame(list(data_2024_percent.items()), columns=['Transport Mode', '2024 Percentage'])
+
+    # Merge the two datasets for easy comparison
+    chart_data = pd.merge(chart_data_2020, chart_data_2024, on='Transport Mode')
+
+    # Reshape the data so that we have one row per transport mode and year
+    chart_data_melted = chart_data.melt(id_vars=["Transport Mode"], value_vars=["2020 Percentage", "2024 Percentage"], 
+                                        var_name="Year", value_name="Percentage")
+
+    # Sort the data by percentage in descending order
+    chart_data_melted = chart_data_melted.sort_values('Percentage', ascending=False)
+
+    # Create the bar chart with separate bars for 2020 and 2024
+    fig = px.bar(
+        chart_data_melted,
+        y='Transport Mode',
+        x='Percentage',
+        color='Year',
+        barmode='group',  # Group bars for 2020 and 2024
+        title='Percentage of Ridership by Transport Mode in 2020 and 2024',
+        labels={'Transport Mode': 'Transport Mode', 'Percentage': 'Percentage (%)'},
+        color_discrete_sequence=px.colors.qualitative.Set2,
+        text='Percentage'  # Add percentage values as text on bars
+    )
+
+    # Customize the text and layout
+    fig.update_traces(
+        texttemplate='%{text:.2f}%',  # Format text to show 2 decimal places
+        textposition='inside'  # Position text inside the bars
+    )
+
+    # Remove axis titles and put labels below
+    fig.update_layout(
+        xaxis_title=None,  # Remove title for the x-axis
+        yaxis_title=None,  # Remove title for the y-axis
+        xaxis=dict(tickangle=0),  # Set the angle for x-axis labels to horizontal
+        yaxis=dict(tickangle=0),  # Set the angle for y-axis labels to horizontal
+        showlegend=True,
+        width=800,  # Adjust the width of the chart (e.g., 800 pixels)
+        xaxis_tickangle=-45,  # Rotate x-axis labels to make them more readable
+        margin={'l': 50, 'r': 50, 't': 50, 'b': 150},  # Add bottom margin to space out the x labels
+    )
+
+    # Move the legend below the chart
+    fig.update_layout(
+        legend=dict(
+            orientation="h",  # Horizontal layout
+            yanchor="bottom",  # Anchor to the bottom
+            y=-0.3,  # Position below the chart
+            xanchor="center",  # Center the legend horizontally
+            x=0.5  # Position in the middle
+        ),
+        showlegend=True,
+        width=500,  # Adjust the width of the chart (e.g., 1000 pixels)
+    )
+
+    # Reduce font size of title
+    fig.update_layout(
+        title_font=dict(
+            family="Arial, sans-serif", 
+            size=16,  # Reduced font size
+            color="black", 
+            weight="bold"
+        ),
+        height=500  # Increase the height of the chart
+    )
+    return fig
@@ -0,0 +1,179 @@
+import argparse
+import hashlib
+import io
+import json
+import os
+import urllib.request
+
+import flask
+from dash import html
+
+try:
+    from PIL import Image, ImageOps  # In requirements.txt; without it the originals are vendored as they are
+except ImportError:
+    Image = None
+
+# Banner images the pages show: where they come from and the box they are displayed in (width x height,
+# cropped like CSS object-fit: cover). `python mta_images.py` vendors them into assets/img.
+IMAGES = {
+    'about-banner': {
+        'source': "https://a.loveholidays.ie/media-library/~production/74f669f2278072d261f503d89e6b884b431a082d-3200x1173.jpg?auto=avif%2Cwebp&quality=80&dpr=1.5&optimize=high&fit=crop&width=1280&height=380",
+        'size': (1280, 380),
+        'alt': "New York City skyline",
+    },
+    'subway-banner': {
+        'source': "https://www.immihelp.com/assets/cms/traveling-via-metros-and-subways-in-the-us-newcomers-guide.jpg",
+        'size': (1280, 250),
+        'alt': "Subway platform",
+    },
+}
+
+# Widths of the resized variants; the browser picks one from srcset for the viewport and pixel density
+VARIANT_WIDTHS = (640, 1280, 1920)
+
+# Modern format first, JPEG for browsers without WebP
+FORMATS = {'webp': ('WEBP', {'quality': 80, 'method': 6}), 'jpg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True})}
+
+ASSETS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'assets')
+IMAGE_DIR = os.path.join(ASSETS_DIR, 'img')
+MANIFEST_PATH = os.path.join(IMAGE_DIR, 'manifest.json')
+
+# Vendored files are named by content hash, so browsers may keep them for a year without revalidating
+IMAGE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+
+def _content_name(stem, payload, ext):
+    return f"{stem}.{hashlib.sha1(payload).hexdigest()[:12]}.{ext}"
+
+
+def _fetch(source):
+    if os.path.exists(source):
+        with open(source, 'rb') as f:
+            return f.read()
+    request = urllib.request.Request(source, headers={'User-Agent': 'Mozilla/5.0'})
+    with urllib.request.urlopen(request, timeout=30) as response:
+        return response.read()
+
+
+# Write the variants of one image into out_dir; returns its manifest entry:
+# {'width', 'height', 'alt', 'formats': {ext: [[file, width], ...]}}, smallest first, largest last
+def build_image(name, spec, original, out_dir=IMAGE_DIR):
+    width, height = spec['size']
+    entry = {'width': width, 'height': height, 'alt': spec['alt'], 'formats': {}}
+    if Image is None:
+        # No resizing without Pillow: vendor the original once, so pages still stop depending on the remote host
+        ext = 'png' if original.startswith(b'\x89PNG') else 'jpg'
+        file = _content_name(name, original, ext)
+        with open(os.path.join(out_dir, file), 'wb') as f:
+            f.write(original)
+        entry['formats'][ext] = [[file, None]]  # Width unknown, so no srcset
+        print(f"Pillow is not installed; vendored {name} without resizing")
+        return entry
+
+    image = ImageOps.exif_transpose(Image.open(io.BytesIO(original))).convert('RGB')
+    # Never upscale: the widest crop the original allows stands in for the variants it is too small for
+    widest = min(image.width, image.height * width // height, VARIANT_WIDTHS[-1])
+    widths = [w for w in VARIANT_WIDTHS if w < widest] + [widest]
+    for ext, (image_format, options) in FORMATS.items():
+        files = []
+        for variant_width in widths:
+            variant = ImageOps.fit(image, (variant_width, round(variant_width * height / width)), Image.LANCZOS)
+            buffer = io.BytesIO()
+            variant.save(buffer, image_format, **options)
+            payload = buffer.getvalue()
+            file = _content_name(f"{name}-{variant_width}w", payload, ext)
+            with open(os.path.join(out_dir, file), 'wb') as f:
+                f.write(payload)
+            files.append([file, variant_width])
+        entry['formats'][ext] = files
+    return entry
+
+
+# Fetch every image in IMAGES (or the local files in `sources`), write the variants and the manifest, and
+# remove variants the new manifest no longer lists
+def build_images(sources=None, out_dir=IMAGE_DIR):
+    os.makedirs(out_dir, exist_ok=True)
+    manifest = {}
+    for name, spec in IMAGES.items():
+        source = (sources or {}).get(name, spec['source'])
+        try:
+            original = _fetch(source)
+        except OSError as exc:
+            raise SystemExit(f"Could not fetch {name} from {source}: {exc} (use --source {name}=FILE to build from a local copy)")
+        manifest[name] = build_image(name, spec, original, out_dir)
+        sizes = sum(os.path.getsize(os.path.join(out_dir, file)) for files in manifest[name]['formats'].values() for file, _ in files)
+        print(f"{name}: {sum(len(files) for files in manifest[name]['formats'].values())} files, {sizes / 1024:.0f} KiB")
+
+    keep = {file for entry in manifest.values() for files in entry['formats'].values() for file, _ in files}
+    for file in os.listdir(out_dir):
+        if file not in keep and file.startswith(tuple(IMAGES)):
+            os.remove(os.path.join(out_dir, file))
+    with open(os.path.join(out_dir, os.path.basename(MANIFEST_PATH)), 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    return manifest
+
+
+def load_manifest(path=MANIFEST_PATH):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+_manifest = load_manifest()
+
+
+def _srcset(asset_url, files):
+    if files[-1][1] is None:
+        return None
+    return ', '.join(f"{asset_url}img/{file} {width}w" for file, width in files)
+
+
+# Banner for one of IMAGES: a <picture> of the vendored variants when the pipeline has been run, else the
+# remote image as before. `asset_url` is the app's assets URL prefix (app.get_asset_url('')).
+def banner_image(name, class_name, asset_url='/assets/'):
+    spec = IMAGES[name]
+    entry = _manifest.get(name)
+    if entry is None:
+        return html.Img(src=spec['source'], alt=spec['alt'], className=class_name)
+    formats = entry['formats']
+    fallback = formats.get('jpg') or next(iter(formats.values()))
+    sources = [html.Source(srcSet=_srcset(asset_url, formats['webp']), sizes='100vw', type='image/webp')] if 'webp' in formats else []
+    return html.Picture(sources + [
+        html.Img(
+            src=f"{asset_url}img/{fallback[-1][0]}", srcSet=_srcset(asset_url, fallback), sizes='100vw',
+            width=entry['width'], height=entry['height'], alt=entry['alt'], className=class_name
+        ),
+    ])
+
+
+# Long-lived cache headers for the vendored images (Flask would otherwise have browsers revalidate each load)
+def add_image_caching(server, asset_url='/assets/'):
+    prefix = f"{asset_url}img/"
+
+    @server.after_request
+    def cache_images(response):
+        path = flask.request.path
+        if path.startswith(prefix) and not path.endswith('.json') and response.status_code == 200:
+            response.headers['Cache-Control'] = IMAGE_CACHE_CONTROL
+        return response
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Vendor the page banner images into assets/img as resized, hashed variants")
+    parser.add_argument(
+        '--source', action='append', default=[], metavar='NAME=PATH_OR_URL',
+        help=f"Build an image from a local file or another URL instead of its default source ({', '.join(IMAGES)})"
+    )
+    parser.add_argument('--out', default=IMAGE_DIR, help="Output directory (default: assets/img)")
+    args = parser.parse_args(argv)
+    sources = dict(source.split('=', 1) for source in args.source)
+    unknown = set(sources) - set(IMAGES)
+    if unknown:
+        parser.error(f"unknown images {sorted(unknown)}; expected any of {list(IMAGES)}")
+    build_images(sources, args.out)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,130 @@
+import bisect
+import functools
+import os
+import threading
+import time
+
+import flask
+from dash.exceptions import PreventUpdate
+
+# Set MTA_METRICS=0 to leave callbacks unwrapped and skip the /metrics route
+METRICS_ENABLED = os.environ.get('MTA_METRICS', '1') not in ('', '0')
+
+# Histogram upper bounds: callback latency in seconds and response payload in bytes
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+PAYLOAD_BUCKETS = (1_000, 10_000, 50_000, 100_000, 500_000, 1_000_000, 5_000_000)
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # Last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def render(self, name, labels):
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + ('+Inf',), self.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+        lines.append(f'{name}_sum{{{labels}}} {self.sum}')
+        lines.append(f'{name}_count{{{labels}}} {self.count}')
+        return lines
+
+
+# Per-callback latency, payload size, call and error counts for this process. Each gunicorn worker keeps
+# its own, so /metrics reports the worker that answered the scrape (label by instance when aggregating).
+class CallbackMetrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._latency = {}
+        self._payload = {}
+        self._errors = {}
+        self._gauges = {}
+
+    def observe(self, callback, seconds, payload_bytes=None, error=False):
+        with self._lock:
+            if callback not in self._latency:
+                self._latency[callback] = Histogram(LATENCY_BUCKETS)
+                self._payload[callback] = Histogram(PAYLOAD_BUCKETS)
+                self._errors[callback] = 0
+            self._latency[callback].observe(seconds)
+            if payload_bytes is not None:
+                self._payload[callback].observe(payload_bytes)
+            if error:
+                self._errors[callback] += 1
+
+    # Extra values read at scrape time, e.g. cache hit counters: name -> (type, help, function returning a number)
+    def add_gauge(self, name, kind, help_text, read):
+        self._gauges[name] = (kind, help_text, read)
+
+    def render(self):
+        with self._lock:
+            callbacks = sorted(self._latency)
+            lines = [
+                '# HELP dash_callback_duration_seconds Callback run time including response serialization',
+                '# TYPE dash_callback_duration_seconds histogram',
+            ]
+            for callback in callbacks:
+                lines += self._latency[callback].render('dash_callback_duration_seconds', f'callback="{callback}"')
+            lines += [
+                '# HELP dash_callback_response_bytes Serialized callback response size',
+                '# TYPE dash_callback_response_bytes histogram',
+            ]
+            for callback in callbacks:
+                lines += self._payload[callback].render('dash_callback_response_bytes', f'callback="{callback}"')
+            lines += [
+                '# HELP dash_callback_errors_total Callbacks that raised (PreventUpdate is not an error)',
+                '# TYPE dash_callback_errors_total counter',
+            ]
+            for callback in callbacks:
+                lines.append(f'dash_callback_errors_total{{callback="{callback}"}} {self._errors[callback]}')
+        for name, (kind, help_text, read) in sorted(self._gauges.items()):
+            lines += [f'# HELP {name} {help_text}', f'# TYPE {name} {kind}', f'{name} {read()}']
+        return '\n'.join(lines) + '\n'
+
+
+def _payload_bytes(response):
+    if isinstance(response, str):
+        return len(response) if response.isascii() else len(response.encode('utf-8'))
+    return None
+
+
+def _wrap(callback, name, metrics):
+    @functools.wraps(callback)
+    def timed_callback(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            response = callback(*args, **kwargs)
+        except PreventUpdate:
+            metrics.observe(name, time.perf_counter() - start)
+            raise
+        except Exception:
+            metrics.observe(name, time.perf_counter() - start, error=True)
+            raise
+        metrics.observe(name, time.perf_counter() - start, _payload_bytes(response))
+        return response
+    return timed_callback
+
+
+# Wrap every server-side callback registered so far and serve the Prometheus text format on /metrics.
+# Call it after the last @app.callback.
+def instrument_app(app, metrics=None):
+    metrics = metrics or CallbackMetrics()
+    for entry in app.callback_map.values():
+        callback = entry.get('callback')
+        if callback is not None:
+            name = getattr(callback, '__wrapped__', callback).__name__
+            entry['callback'] = _wrap(callback, name, metrics)
+
+    @app.server.route('/metrics')
+    def prometheus_metrics():
+        return flask.Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+    return metrics
@@ -0,0 +1,38 @@
+import threading
+
+
+# Page layouts by pathname, each built on the first request for it and reused until the dataset version
+# changes (a refresh or a new snapshot). Workers that never serve a page never build it or its figures.
+class PageRegistry:
+    def __init__(self, default=None):
+        self.default = default
+        self.version = None
+        self._builders = {}
+        self._layouts = {}
+        self._lock = threading.Lock()
+
+    def register(self, pathname, build):
+        self._builders[pathname] = build
+
+    # Layout for `pathname` (the default page for unknown paths) built from Dataset `ds`
+    def get(self, pathname, ds):
+        if pathname not in self._builders:
+            pathname = self.default
+        with self._lock:
+            if ds.version != self.version:
+                self._layouts.clear()
+                self.version = ds.version
+            layout = self._layouts.get(pathname)
+        if layout is not None:
+            return layout
+
+        # Build outside the lock so a slow page doesn't hold up the others
+        layout = self._builders[pathname](ds)
+        with self._lock:
+            if ds.version == self.version:
+                layout = self._layouts.setdefault(pathname, layout)
+        return layout
+
+    def clear(self):
+        with self._lock:
+            self._layouts.clear()
@@ -0,0 +1,61 @@
+import os
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+# `python dash_app.py --profile-startup` (or MTA_PROFILE_STARTUP=1) times each startup phase, prints the report and exits
+PROFILE_STARTUP = '--profile-startup' in sys.argv or os.environ.get('MTA_PROFILE_STARTUP', '') not in ('', '0')
+
+
+# Wall time, CPU time and tracemalloc peak of named startup phases. Phases can nest; a parent's numbers
+# include its children. When disabled, phase() costs one generator per call and records nothing.
+class StartupProfiler:
+    def __init__(self, enabled=PROFILE_STARTUP):
+        self.enabled = enabled
+        self.phases = []  # (depth, name, wall seconds, cpu seconds, peak bytes above the phase's start) in start order
+        self._peaks = []  # Peak seen so far by each open phase, saved across its children's tracemalloc resets
+        self._start = time.perf_counter()
+        self._cpu_start = time.process_time()
+        if enabled and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    @contextmanager
+    def phase(self, name):
+        if not self.enabled:
+            yield
+            return
+        if self._peaks:
+            self._peaks[-1] = max(self._peaks[-1], tracemalloc.get_traced_memory()[1])
+        index = len(self.phases)
+        self.phases.append(None)
+        self._peaks.append(0)
+        tracemalloc.reset_peak()
+        held = tracemalloc.get_traced_memory()[0]
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield
+        finally:
+            wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+            peak = max(self._peaks.pop(), tracemalloc.get_traced_memory()[1])
+            self.phases[index] = (len(self._peaks), name, wall, cpu, peak - held)
+            if self._peaks:
+                self._peaks[-1] = max(self._peaks[-1], peak)
+            tracemalloc.reset_peak()
+
+    def report(self):
+        lines = [
+            f"{'Startup phase':<48}{'wall ms':>10}{'cpu ms':>10}{'peak +MiB':>11}",
+        ]
+        for depth, name, wall, cpu, peak in self.phases:
+            lines.append(f"{'  ' * depth + name:<48}{wall * 1000:>10.1f}{cpu * 1000:>10.1f}{peak / 2**20:>11.1f}")
+        wall = time.perf_counter() - self._start
+        cpu = time.process_time() - self._cpu_start
+        current, _ = tracemalloc.get_traced_memory()
+        lines.append(f"{'total (since profiler start)':<48}{wall * 1000:>10.1f}{cpu * 1000:>10.1f}{current / 2**20:>11.1f}")
+        lines.append("peak +MiB: traced memory above what was held when the phase started; the total row shows "
+                     "memory still held. Times include tracemalloc overhead.")
+        return '\n'.join(lines)
+
+
+profiler = StartupProfiler()
@@ -0,0 +1,146 @@
+import functools
+import glob
+import hashlib
+import json
+import os
+import sqlite3
+import time
+
+import flask
+
+from mta_data import SNAPSHOT_VERSION
+from mta_sqlite import SharedSqlite
+from mta_styles import STYLESHEET_NAME
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# SQLite file shared by every worker on the host; '' turns the result cache off
+RESULT_CACHE_PATH = os.environ.get('MTA_RESULT_CACHE', os.path.join(APP_DIR, 'snapshot', 'callback_results.sqlite'))
+
+# Entries older than this (seconds) are recomputed; the data changes daily
+RESULT_CACHE_TTL = float(os.environ.get('MTA_RESULT_CACHE_TTL', '86400'))
+
+# Total size of stored responses before the oldest are evicted
+RESULT_CACHE_MAX_BYTES = int(float(os.environ.get('MTA_RESULT_CACHE_MB', '256')) * 2**20)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    key TEXT PRIMARY KEY,
+    version TEXT NOT NULL,
+    response TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS results_created ON results (created);
+"""
+
+
+# Serialized callback responses shared across worker processes through one SQLite file. Entries are keyed
+# by callback id, input values and the triggering props, and belong to one version (of the code and the
+# data, see cache_callbacks): asking with a new version drops every older entry. Reads never write, so eviction is oldest-first rather than LRU.
+class ResultCache:
+    def __init__(self, path=RESULT_CACHE_PATH, ttl=RESULT_CACHE_TTL, max_bytes=RESULT_CACHE_MAX_BYTES):
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._version = None
+        self._sqlite = SharedSqlite(path, timeout=5)
+        db = self._sqlite.connect()
+        db.executescript(SCHEMA)
+        db.close()
+
+    @staticmethod
+    def key(callback_id, args, triggered):
+        payload = json.dumps([callback_id, args, sorted(triggered)], sort_keys=True, default=str)
+        return hashlib.sha1(payload.encode()).hexdigest()
+
+    def get(self, key, version):
+        row = self._sqlite.db().execute(
+            'SELECT response, created FROM results WHERE key = ? AND version = ?', (key, version)
+        ).fetchone()
+        if row is None or time.time() - row[1] > self.ttl:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return row[0]
+
+    def put(self, key, version, response):
+        size = len(response)
+        if size > self.max_bytes:
+            return
+        with self._sqlite.write() as db:
+            if version != self._version:
+                # A new dataset or release: nothing stored for other versions is valid
+                db.execute('DELETE FROM results WHERE version != ?', (version,))
+            db.execute(
+                'INSERT OR REPLACE INTO results (key, version, response, size, created) VALUES (?, ?, ?, ?, ?)',
+                (key, version, response, size, time.time())
+            )
+            db.execute('DELETE FROM results WHERE created < ?', (time.time() - self.ttl,))
+            total = db.execute('SELECT COALESCE(SUM(size), 0) FROM results').fetchone()[0]
+            if total > self.max_bytes:
+                # Oldest first, until the newest entries fit
+                for old_key, old_size in db.execute('SELECT key, size FROM results ORDER BY created').fetchall():
+                    if total <= self.max_bytes:
+                        break
+                    db.execute('DELETE FROM results WHERE key = ?', (old_key,))
+                    total -= old_size
+        self._version = version
+
+    def clear(self):
+        self._sqlite.db().execute('DELETE FROM results')
+
+    def stats(self):
+        entries, size = self._sqlite.db().execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM results').fetchone()
+        return {'hits': self.hits, 'misses': self.misses, 'entries': entries, 'bytes': size}
+
+
+# Identifies the deployed code: the data layout, the stylesheet, the registered callbacks and every module
+# of the app, so a new release never serves responses the previous one cached
+def build_fingerprint(app):
+    digest = hashlib.sha1(f"{SNAPSHOT_VERSION}:{STYLESHEET_NAME}".encode())
+    digest.update(json.dumps(sorted(app.callback_map)).encode())
+    for path in sorted(glob.glob(os.path.join(APP_DIR, '*.py'))):
+        with open(path, 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()[:12]
+
+
+def _wrap(callback, callback_id, cache, version):
+    @functools.wraps(callback)
+    def cached_callback(*args, **kwargs):
+        triggered = flask.request.get_json().get('changedPropIds', []) if flask.has_request_context() else []
+        key = cache.key(callback_id, args, triggered)
+        current = version()
+        try:
+            response = cache.get(key, current)
+        except sqlite3.Error as exc:
+            print(f"Result cache read failed ({exc}); computing {callback_id}")
+            response = None
+        if response is None:
+            response = callback(*args, **kwargs)  # PreventUpdate and errors propagate and are not cached
+            try:
+                cache.put(key, current, response)
+            except sqlite3.Error as exc:
+                print(f"Result cache write failed ({exc}) for {callback_id}")
+        return response
+    return cached_callback
+
+
+# Put every server-side callback registered so far behind `cache`; `version` returns the current dataset's
+# version, which should change whenever its values do (Dataset.content_version). Entries are stored under
+# it and the build fingerprint. Call it after the last @app.callback (and before instrument_app, so metrics
+# time cache hits too).
+def cache_callbacks(app, cache, version):
+    fingerprint = build_fingerprint(app)
+
+    def versioned():
+        return f"{fingerprint}:{version()}"
+
+    for callback_id, entry in app.callback_map.items():
+        callback = entry.get('callback')
+        if callback is not None:
+            entry['callback'] = _wrap(callback, callback_id, cache, versioned)
+    return cache
@@ -0,0 +1,166 @@
+import hashlib
+import json
+import os
+
+import numpy as np
+
+from mta_aggregates import CUBE_MEASURES, AggregateCube
+from mta_data import COUNT_COLUMNS, dataset_digest
+from mta_sqlite import SharedSqlite
+
+# SQLite file holding the prepared daily rows, shared by every worker on the host
+SQL_PATH = os.environ.get(
+    'MTA_SQL_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'snapshot', 'mta_ridership.sqlite')
+)
+
+EPOCH = np.datetime64('1970-01-01', 'D')
+
+
+def _column(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+# One row per day with the calendar keys the dashboard filters on and every cube measure. Dates are days
+# since 1970-01-01, so a refresh re-inserting a day replaces it instead of duplicating it. The columns are
+# part of the table name, so a release that changes them gets a new table rather than dropping one the
+# workers of the previous release may still be reading.
+def _table_name(measures):
+    return 'ridership_' + hashlib.sha1(json.dumps(measures).encode()).hexdigest()[:10]
+
+
+def _create_table(db, table, measures, integer_measures):
+    columns = ', '.join(
+        f"{_column(measure)} {'INTEGER' if measure in integer_measures else 'REAL'}" for measure in measures
+    )
+    db.execute(
+        f'CREATE TABLE IF NOT EXISTS {table} (day INTEGER PRIMARY KEY, year INTEGER NOT NULL, '
+        f'month INTEGER NOT NULL, weekday INTEGER NOT NULL, {columns})'
+    )
+    db.execute(f'CREATE INDEX IF NOT EXISTS {table}_calendar ON {table} (year, month, weekday)')
+    # Content hashes (mta_data.dataset_digest) of the frames the table currently holds
+    db.execute(f'CREATE TABLE IF NOT EXISTS {table}_loads (digest TEXT PRIMARY KEY)')
+
+
+def _days(data):
+    return (data['Date'].to_numpy().astype('datetime64[D]') - EPOCH).astype(np.int64)
+
+
+# The AggregateCube interface answered with indexed SQL against an on-disk SQLite store instead of in-memory
+# arrays. Every worker on the host shares one table, which may run ahead of a given cube when another worker
+# has already refreshed, so each cube only ever reads the days up to its own last day. A process whose frame
+# is already in the table (another worker, or a restart on the same snapshot) reuses it as is.
+# Selected with MTA_QUERY_BACKEND=sqlite; yearly_summary and kpi_table are the cube's, built on these queries.
+class SqlCube(AggregateCube):
+    def __init__(self, data, path=SQL_PATH, measures=CUBE_MEASURES):
+        self.path = path
+        self.measures = list(measures)
+        self.integer_measures = {measure for measure in self.measures if measure in COUNT_COLUMNS}
+        self.table = _table_name(self.measures)
+        self.last_day = int(_days(data)[-1]) if len(data) else None  # None matches no day
+        self._sqlite = SharedSqlite(path, timeout=30)
+        self._summary_rows = {}
+        self._load(data)
+        self._read_years()
+
+    def _is_loaded(self, db, digest):
+        if db.execute("SELECT 1 FROM sqlite_master WHERE name = ?", (f'{self.table}_loads',)).fetchone() is None:
+            return False
+        return db.execute(f'SELECT 1 FROM {self.table}_loads WHERE digest = ?', (digest,)).fetchone() is not None
+
+    def _load(self, data):
+        digest = dataset_digest(data)
+        if self._is_loaded(self._sqlite.db(), digest):
+            return
+        with self._sqlite.write() as db:
+            _create_table(db, self.table, self.measures, self.integer_measures)
+            # Another process may have loaded it while we waited for the write lock
+            if not self._is_loaded(db, digest):
+                # Our days replace what the table holds up to our last day; days after it, appended by a
+                # worker that refreshed ahead of us, stay for that worker
+                db.execute(f'DELETE FROM {self.table} WHERE day <= ?', (self.last_day,))
+                self._insert(db, data)
+                db.execute(f'DELETE FROM {self.table}_loads')
+                db.execute(f'INSERT INTO {self.table}_loads VALUES (?)', (digest,))
+
+    def _insert(self, db, data):
+        columns = [_days(data), data['Year'].to_numpy(), data['Month'].to_numpy(), data['Day of Week'].to_numpy()]
+        for measure in self.measures:
+            # NaN goes in as NULL, so SUM and COUNT skip it like the cube does; whole-number counts are stored
+            # as INTEGER by the column's affinity
+            values = data[measure].to_numpy().astype(np.float64)
+            columns.append(np.where(np.isnan(values), None, values))
+        rows = zip(*(column.tolist() for column in columns))
+        placeholders = ', '.join('?' * len(columns))
+        db.executemany(f'INSERT OR REPLACE INTO {self.table} VALUES ({placeholders})', rows)
+
+    def _read_years(self):
+        self._set_years([
+            year for (year,) in self._sqlite.db().execute(
+                f'SELECT DISTINCT year FROM {self.table} WHERE day <= ? ORDER BY year', (self.last_day,)
+            )
+        ])
+
+    # A cube over the same store with `new_rows` written into it; costs the new rows only
+    def extended(self, new_rows):
+        cube = SqlCube.__new__(SqlCube)
+        cube.path = self.path
+        cube.measures = self.measures
+        cube.integer_measures = self.integer_measures
+        cube.table = self.table
+        cube.last_day = int(_days(new_rows)[-1]) if len(new_rows) else self.last_day
+        cube._sqlite = self._sqlite
+        cube._summary_rows = {}
+        with cube._sqlite.write() as db:
+            self._insert(db, new_rows)
+        cube._read_years()
+        return cube
+
+    # SUM and COUNT of one measure; month is 1-12, weekday is 0-6 or a list of them
+    def _aggregate(self, measure, year, month=None, weekday=None):
+        where = ['day <= ?', 'year = ?']
+        params = [self.last_day, year]
+        if month is not None:
+            where.append('month = ?')
+            params.append(month)
+        if weekday is not None:
+            weekdays = list(np.atleast_1d(weekday))
+            where.append(f"weekday IN ({', '.join('?' * len(weekdays))})")
+            params.extend(int(day) for day in weekdays)
+        column = _column(measure)
+        return self._sqlite.db().execute(
+            f"SELECT COALESCE(SUM({column}), 0), COUNT({column}) FROM {self.table} WHERE {' AND '.join(where)}", params
+        ).fetchone()
+
+    # numpy scalars like the cube's, so dividing by an empty year gives inf/nan rather than raising
+    def total(self, measure, year, month=None, weekday=None):
+        return np.float64(self._aggregate(measure, year, month, weekday)[0])
+
+    def count(self, measure, year, month=None, weekday=None):
+        return np.int64(self._aggregate(measure, year, month, weekday)[1])
+
+    # SUM and COUNT come back from one query
+    def mean(self, measure, year, month=None, weekday=None):
+        total, count = self._aggregate(measure, year, month, weekday)
+        return np.float64(total) / np.int64(count) if count else np.float64(np.nan)
+
+    # One GROUP BY year query per measure, for kpi_table
+    def _yearly_totals(self, measure):
+        column = _column(measure)
+        rows = self._sqlite.db().execute(
+            f"SELECT year, COALESCE(SUM({column}), 0), COUNT({column}) FROM {self.table} WHERE day <= ? GROUP BY year",
+            (self.last_day,)
+        )
+        return {year: (np.float64(total), np.int64(count)) for year, total, count in rows}
+
+    def _day_type_totals(self, measure):
+        column = _column(measure)
+        rows = self._sqlite.db().execute(f"""
+            SELECT year,
+                   COALESCE(SUM(CASE WHEN weekday < 5 THEN {column} END), 0),
+                   COALESCE(SUM(CASE WHEN weekday >= 5 THEN {column} END), 0),
+                   COALESCE(SUM(CASE WHEN weekday = 6 THEN {column} END), 0),
+                   COALESCE(SUM({column}), 0)
+            FROM {self.table} WHERE day <= ? GROUP BY year ORDER BY year
+        """, (self.last_day,)).fetchall()
+        return np.array([row[1:] for row in rows], dtype=np.float64).reshape(len(rows), 4)
+
@@ -0,0 +1,41 @@
+import contextlib
+import os
+import sqlite3
+import threading
+
+
+# Connections to one SQLite file shared by every worker on the host (the result cache, the SQL query
+# backend): one per thread and process, since connections don't survive a fork. WAL, so readers in other
+# workers don't wait for a writer.
+class SharedSqlite:
+    def __init__(self, path, timeout):
+        self.path = path
+        self.timeout = timeout
+        self._local = threading.local()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def connect(self):
+        db = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+        db.execute('PRAGMA journal_mode=WAL')
+        db.execute('PRAGMA synchronous=NORMAL')
+        return db
+
+    def db(self):
+        if getattr(self._local, 'pid', None) != os.getpid():
+            self._local.db = self.connect()
+            self._local.pid = os.getpid()
+        return self._local.db
+
+    # Write lock taken up front, so a read-then-write can't be overtaken by another process's write
+    @contextlib.contextmanager
+    def write(self):
+        db = self.db()
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            yield db
+            db.execute('COMMIT')
+        except BaseException:
+            db.execute('ROLLBACK')
+            raise
@@ -0,0 +1,107 @@
+import argparse
+import resource
+import sys
+import time
+
+import pandas as pd
+
+from mta_data import RENAME_COLUMNS, SNAPSHOT_PATH, prepare_data, write_snapshot
+
+# Feed rows held in memory at once; peak memory scales with this, not with the size of the file
+STREAM_CHUNK_ROWS = 250_000
+
+
+# Chunks of the feed, reading only the timestamp and measure columns
+def read_chunks(source, timestamp_column, columns, chunk_rows=STREAM_CHUNK_ROWS):
+    with pd.read_csv(source, usecols=[timestamp_column] + columns, chunksize=chunk_rows) as reader:
+        yield from reader
+
+
+# Only the rows of days after `last_date`. For newest-first feeds reading stops at the first chunk that
+# reaches known days, as in mta_dataset.read_new_rows.
+def days_after(chunks, timestamp_column, last_date):
+    for chunk in chunks:
+        days = pd.to_datetime(chunk[timestamp_column]).dt.normalize()
+        is_new = (days > last_date).to_numpy()
+        yield chunk[is_new]
+        if not is_new.all() and days.iloc[0] >= days.iloc[-1]:
+            break
+
+
+# Per-day sums and non-null counts of each chunk; a day with no values in a column sums to NaN, not 0
+def daily_partials(chunks, timestamp_column, columns):
+    for chunk in chunks:
+        days = pd.to_datetime(chunk[timestamp_column]).dt.normalize()
+        grouped = chunk[columns].groupby(days)
+        yield len(chunk), grouped.sum(min_count=1), grouped.count()
+
+
+# Fine-grained feed (e.g. per station and hour) folded into the daily frame the dashboard is built from:
+# one row per day with the raw export's column names. Count columns are summed; '% of Comparable
+# Pre-Pandemic Day' columns are averaged over the rows of each day. With `after`, only days after that date
+# are read (the background refresher's new days). Returns the frame and ingest stats.
+def stream_daily(source, timestamp_column='Date', chunk_rows=STREAM_CHUNK_ROWS, after=None):
+    header = pd.read_csv(source, nrows=0).columns
+    columns = [column for column in RENAME_COLUMNS if column in header]
+    mean_columns = [column for column in columns if '% of Comparable' in column]
+
+    start = time.perf_counter()
+    rows = 0
+    sums = None
+    counts = None
+    chunks = read_chunks(source, timestamp_column, columns, chunk_rows)
+    if after is not None:
+        chunks = days_after(chunks, timestamp_column, after)
+    for chunk_rows_read, chunk_sums, chunk_counts in daily_partials(chunks, timestamp_column, columns):
+        rows += chunk_rows_read
+        # Days can span chunk boundaries, so partial days are added together rather than appended. A day
+        # missing a column in one chunk (NaN) takes the other chunk's value; missing in all, it stays NaN.
+        sums = chunk_sums if sums is None else sums.add(chunk_sums, fill_value=0)
+        counts = chunk_counts if counts is None else counts.add(chunk_counts, fill_value=0)
+    seconds = time.perf_counter() - start
+
+    if sums is None:
+        daily = pd.DataFrame(columns=['Date'] + columns)
+    else:
+        daily = sums.copy()
+        daily[mean_columns] = sums[mean_columns] / counts[mean_columns]
+        # Partial-day additions go through float; counts come back as whole numbers, NaN where a day has none
+        count_columns = [column for column in columns if column not in mean_columns]
+        daily[count_columns] = daily[count_columns].round()
+        daily = daily.rename_axis('Date').reset_index()
+
+    stats = {
+        'rows': rows,
+        'days': len(daily),
+        'seconds': seconds,
+        'rows_per_sec': rows / seconds if seconds else float('inf'),
+        'peak_rss_bytes': peak_rss_bytes(),
+    }
+    return daily, stats
+
+
+def peak_rss_bytes():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024  # Linux reports kilobytes
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Stream a large ridership feed into the daily dashboard snapshot")
+    parser.add_argument('source', help="CSV URL or path of the fine-grained feed")
+    parser.add_argument('--timestamp-column', default='Date')
+    parser.add_argument('--chunk-rows', type=int, default=STREAM_CHUNK_ROWS)
+    parser.add_argument('--snapshot', default=SNAPSHOT_PATH, help="Snapshot file the dashboard loads from")
+    args = parser.parse_args(argv)
+
+    daily, stats = stream_daily(args.source, args.timestamp_column, args.chunk_rows)
+    print(
+        f"Ingested {stats['rows']:,} rows into {stats['days']:,} days in {stats['seconds']:.2f}s "
+        f"({stats['rows_per_sec']:,.0f} rows/sec, peak RSS {stats['peak_rss_bytes'] / 2**20:,.1f} MiB)"
+    )
+    if args.snapshot:
+        write_snapshot(prepare_data(daily), args.snapshot, source=args.source)
+        print(f"Wrote {args.snapshot}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,135 @@
+import hashlib
+import re
+
+import flask
+
+# Style properties React leaves unitless; any other bare number in a style gets 'px', as in the live app
+UNITLESS_STYLES = {'flex', 'flexGrow', 'flexShrink', 'fontWeight', 'lineHeight', 'opacity', 'order', 'zIndex', 'z-index'}
+
+# The layouts' static styles as named classes (the same properties the components used to carry inline).
+# Components reference them with className; later classes win over earlier ones on the same element.
+STYLES = {
+    # Shell: sidebar, page area and footer
+    'sidebar': {
+        'width': '20%', 'display': 'inline-block', 'verticalAlign': 'top',
+        'padding': '20px', 'backgroundColor': '#1f2e45', 'height': '100vh'
+    },
+    'sidebar-title': {'textAlign': 'left', 'color': '#FFFFFF'},
+    'nav-link': {'display': 'block', 'padding': '10px', 'fontSize': '18px', 'color': '#FFFFFF'},
+    'nav-link-active': {'color': '#FFD700'},  # Gold color for active link
+    'app-body': {'display': 'flex', 'alignItems': 'start'},
+    'page-content': {'width': '70%', 'display': 'inline-block', 'padding': '20px'},
+    'footer': {'backgroundColor': '#FFFFFF', 'position': 'relative', 'width': '100%'},
+    'footer-note': {'textAlign': 'left', 'color': 'gray', 'fontSize': 12, 'margin': '15px'},
+    'granularity-option': {'marginRight': '15px', 'fontSize': '14px'},
+
+    # About page
+    'about': {'margin-right': '10px', 'margin-left': '10px'},
+    'about-banner': {'position': 'relative', 'width': '100%', 'height': '380px', 'margin-bottom': '0'},
+    'about-banner-img': {'width': '100%', 'max-width': '5000px', 'height': 'auto', 'display': 'block', 'margin': '0 auto'},
+    'about-title': {
+        'position': 'absolute', 'top': '50%', 'left': '35px', 'transform': 'translateY(-50%)', 'color': 'white',
+        'font-size': '36px', 'text-shadow': '2px 2px 4px rgba(0, 0, 0, 0.5)', 'z-index': '10',
+    },
+    'about-row': {'display': 'flex', 'justifyContent': 'space-between', 'alignItems': 'flex-start', 'margin-right': '10px'},
+    'about-text': {'flex': 1, 'textAlign': 'justify', 'padding': '20px', 'width': '70%'},
+    'about-chart': {'flex': 1, 'padding': '20px'},
+
+    # Overview and Segment page banners and intro text
+    'banner': {'position': 'relative', 'marginBottom': '20px'},
+    'banner-img': {
+        'width': '100%', 'height': '250px', 'object-fit': 'cover', 'object-position': 'center', 'borderRadius': '10px',
+        'position': 'relative'
+    },
+    'banner-title': {
+        'position': 'absolute', 'top': '50%', 'left': '250px', 'bottom': '300px', 'transform': 'translate(-50%, -50%)',
+        'color': 'white', 'fontSize': '36px', 'fontWeight': 'bold', 'textShadow': '2px 2px 4px rgba(0,0,0,0.5)',
+    },
+    'intro-row': {'display': 'flex', 'justifyContent': 'space-between', 'marginBottom': '10px'},
+    'intro-column': {'flex': '1', 'textAlign': 'left'},
+    'intro-text': {
+        'textAlign': 'justify', 'padding': '10px', 'fontSize': '16px', 'color': '#333', 'backgroundColor': '#FFFFFF',
+        'borderRadius': '8px', 'marginBottom': '10px', 'flex': '1', 'marginRight': '50px', 'width': '100%',
+    },
+    'intro-text-flush': {'marginBottom': '0px', 'width': 'auto'},
+
+    # KPI cards: the Overview's pair side by side, the Segment's stacked next to the chart
+    'kpi-row': {'display': 'flex', 'justifyContent': 'space-between', 'marginBottom': '20px'},
+    'kpi-card': {
+        'padding': '10px', 'backgroundColor': '#E6E6FA', 'border': '1px solid grey', 'borderRadius': '10px',
+        'height': '140px', 'boxSizing': 'border-box', 'color': 'black', 'marginBottom': '15px', 'width': '40%',
+        'marginTop': '10px',
+    },
+    'kpi-card-left': {'marginRight': '2%'},
+    'kpi-card-right': {'marginLeft': '2%'},
+    'kpi-card-stacked': {'borderRadius': '5px', 'width': '80%', 'marginTop': '0'},
+    'kpi-card-first': {'marginTop': '30px'},
+    'kpi-title': {'fontSize': 16},
+    'kpi-value': {'fontSize': 18, 'color': 'black', 'fontWeight': 'bold'},
+    'kpi-title-small': {'fontSize': 14},
+    'kpi-value-small': {'fontSize': 16},
+    'kpi-note': {'fontSize': 12, 'color': 'black'},
+    # YoY line under a KPI: green for an increase, red for a decrease
+    'kpi-up': {'color': 'green', 'fontWeight': 'bold', 'fontSize': 16},
+    'kpi-down': {'color': 'red', 'fontWeight': 'bold', 'fontSize': 16},
+
+    # Overview page
+    'year-picker': {
+        'textAlign': 'right', 'padding': '10px', 'marginLeft': '10px', 'borderRadius': '5px', 'marginTop': '10px',
+        'flexDirection': 'column', 'alignItems': 'flex-end', 'width': '100%', 'marginBottom': '5px'
+    },
+    'overview-chart': {
+        'width': '100%', 'padding': '5px', 'backgroundColor': '#FFFFFF', 'borderRadius': '10px', 'color': 'black',
+        'marginTop': '20px',
+    },
+
+    # Segment page
+    'pickers': {'textAlign': 'right', 'padding': '3px', 'marginLeft': '10px'},
+    'picker': {'width': '20%', 'position': 'relative', 'padding': '5px', 'display': 'inline-block'},
+    'segment-row': {'display': 'flex', 'alignItems': 'flex-start', 'justifyContent': 'space-between'},
+    'segment-kpis': {
+        'width': '100%', 'display': 'inline-block', 'padding': '10px', 'verticalAlign': 'top', 'backgroundColor': '#FFFFFF',
+        'borderRadius': '10px', 'color': 'black', 'marginRight': '10px',
+    },
+    'segment-chart': {
+        'width': '250%', 'display': 'inline-block', 'padding': '5px', 'backgroundColor': '#FFFFFF', 'borderRadius': '10px',
+        'height': '390px', 'boxSizing': 'border-box', 'color': 'black',
+    },
+    'overlay-panel': {'width': '100%', 'backgroundColor': '#FFFFFF', 'borderRadius': '10px', 'marginTop': '15px'},
+    'ytd-comparison': {'fontSize': 14, 'color': 'black', 'margin': '10px'},
+    'full-width': {'width': '100%'},
+}
+
+STYLESHEET_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+
+# 'fontSize: 16' -> 'font-size: 16px', the way React writes a style prop into the DOM
+def css_declarations(style):
+    declarations = []
+    for key, value in (style or {}).items():
+        name = key if '-' in key else re.sub(r'([A-Z])', r'-\1', key).lower()
+        if isinstance(value, (int, float)) and not isinstance(value, bool) and key not in UNITLESS_STYLES:
+            value = f'{value}px'
+        declarations.append(f'{name}: {value}')
+    return '; '.join(declarations)
+
+
+def render_css(styles=STYLES):
+    return ''.join(f".{name} {{ {css_declarations(style)} }}\n" for name, style in styles.items())
+
+
+STYLESHEET = render_css()
+
+# Named by content hash, so browsers keep it until the styles change
+STYLESHEET_NAME = f"mta.{hashlib.sha1(STYLESHEET.encode()).hexdigest()[:12]}.css"
+
+
+# Serve the generated stylesheet from the app's server and link it from every page
+def add_stylesheet(app):
+    route = f"{app.config.routes_pathname_prefix}_mta/{STYLESHEET_NAME}"
+
+    @app.server.route(route)
+    def stylesheet():
+        return flask.Response(STYLESHEET, mimetype='text/css', headers={'Cache-Control': STYLESHEET_CACHE_CONTROL})
+
+    app.config.external_stylesheets.append(f"{app.config.requests_pathname_prefix}_mta/{STYLESHEET_NAME}")
@@ -0,0 +1,190 @@
+import copy
+
+import numpy as np
+import pandas as pd
+
+from mta_aggregates import YearIndex
+from mta_data import WEEKDAYS, segments
+
+# Series the trend charts can show, in selector order: key -> label used in the selector and chart titles.
+# Weekly and monthly points are the average day of each week (Monday start) or calendar month.
+GRANULARITIES = {
+    'daily': 'Daily',
+    'rolling7': '7-Day Average',
+    'rolling28': '28-Day Average',
+    'weekly': 'Weekly Average',
+    'monthly': 'Monthly Average',
+}
+
+ROLLING_DAYS = {'rolling7': 7, 'rolling28': 28}
+
+# Columns the trend charts plot
+TREND_COLUMNS = segments + ['Total Ridership']
+
+
+# Every smoothed and coarser trend series, computed once per dataset from cumulative sums, so switching
+# granularity on a chart is a lookup. Each series is a date-sorted frame with 'Date' and TREND_COLUMNS;
+# 'daily' is the prepared frame itself. Year selections go through each series' YearIndex (`rows`).
+class TrendSeries:
+    def __init__(self, data, columns=TREND_COLUMNS):
+        self.columns = list(columns)
+        self.series = {'daily': data, **self._derived(data)}
+        self.rows = {granularity: YearIndex(frame) for granularity, frame in self.series.items()}
+
+    # The rolling, weekly and monthly series of `data`
+    def _derived(self, data):
+        dates = data['Date'].to_numpy()
+        values = data[self.columns].to_numpy(dtype=np.float64)
+        present = ~np.isnan(values)
+        sums = np.concatenate([np.zeros((1, len(self.columns))), np.cumsum(np.where(present, values, 0.0), axis=0)])
+        counts = np.concatenate([np.zeros((1, len(self.columns)), dtype=np.int64), np.cumsum(present, axis=0)])
+
+        series = {}
+        for granularity, days in ROLLING_DAYS.items():
+            series[granularity] = self._frame(dates, self._rolling_mean(sums, counts, days))
+
+        # Rows of a week or month are contiguous in the sorted frame; their means come from the cumulative
+        # sums at the group boundaries
+        day_numbers = dates.astype('datetime64[D]')
+        week_starts = day_numbers - ((day_numbers.astype(np.int64) + 3) % 7)  # 1970-01-01 was a Thursday
+        month_starts = day_numbers.astype('datetime64[M]').astype('datetime64[D]')
+        series['weekly'] = self._grouped(week_starts, sums, counts)
+        series['monthly'] = self._grouped(month_starts, sums, counts)
+        return series
+
+    # Series for `data`, whose first `start` rows are the rows these were built from. Only what new rows can
+    # change is recomputed: the trailing rolling windows and the last week and month.
+    def extended(self, data, start):
+        if start == 0:
+            return TrendSeries(data, self.columns)
+        dates = data['Date'].to_numpy()
+        # The tail starts a full rolling window before the new rows, and no later than the old last week and month
+        tail_start = start - max(ROLLING_DAYS.values()) + 1
+        for granularity in ('weekly', 'monthly'):
+            last_group = self.series[granularity]['Date'].iloc[-1].to_datetime64().astype(dates.dtype)
+            tail_start = min(tail_start, int(np.searchsorted(dates, last_group)))
+        tail_start = max(tail_start, 0)
+        tail = self._derived(data.iloc[tail_start:])
+
+        trends = copy.copy(self)
+        trends.series = {'daily': data}
+        trends.rows = {'daily': self.rows['daily'].extended(data, start)}
+        for granularity in GRANULARITIES:
+            if granularity == 'daily':
+                continue
+            old = self.series[granularity]
+            new = tail[granularity]
+            if granularity in ROLLING_DAYS:
+                # Points from `start` on have full windows, since the tail reaches back a whole window
+                keep, new = start, new.iloc[start - tail_start:]
+            else:
+                # The old last week or month may have gained days, so it is replaced along with what follows
+                keep = len(old) - 1
+                new = new.iloc[np.searchsorted(new['Date'].to_numpy(), old['Date'].iloc[-1].to_datetime64()):]
+            trends.series[granularity] = pd.concat([old.iloc[:keep], new], ignore_index=True)
+            trends.rows[granularity] = self.rows[granularity].extended(trends.series[granularity], keep)
+        return trends
+
+    # Mean of the trailing `days` rows ending at each row; NaN until a full window of values is available
+    @staticmethod
+    def _rolling_mean(sums, counts, days):
+        window_sums = sums[days:] - sums[:-days]
+        window_counts = counts[days:] - counts[:-days]
+        means = np.full((len(sums) - 1, sums.shape[1]), np.nan)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            means[days - 1:] = np.where(window_counts == days, window_sums / window_counts, np.nan)
+        return means
+
+    def _grouped(self, group_starts, sums, counts):
+        if len(group_starts) == 0:
+            return self._frame(group_starts, np.empty((0, len(self.columns))))
+        first_rows = np.r_[0, np.flatnonzero(group_starts[1:] != group_starts[:-1]) + 1]
+        bounds = np.r_[first_rows, len(group_starts)]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            means = (sums[bounds[1:]] - sums[bounds[:-1]]) / (counts[bounds[1:]] - counts[bounds[:-1]])
+        return self._frame(group_starts[first_rows], means)
+
+    def _frame(self, dates, values):
+        frame = pd.DataFrame(values.astype(np.float32), columns=self.columns)
+        frame.insert(0, 'Date', pd.to_datetime(dates))
+        return frame
+
+    # Points of `granularity` dated in first_year..last_year
+    def range_rows(self, granularity, first_year, last_year):
+        return self.rows[granularity].range_rows(first_year, last_year)
+
+
+# Each ISO year's daily values on a shared weekday-aligned calendar: position (week - 1) * 7 + weekday, so
+# Monday of week 10 lines up with Monday of week 10 in every year. Built once per dataset as a
+# (columns, years, 371) matrix with NaN for missing days, plus cumulative sums along the calendar axis,
+# so year overlays and same-period-to-date comparisons are slices instead of per-request groupbys.
+class YearOverlay:
+    DAYS = 53 * 7
+
+    def __init__(self, data, columns=TREND_COLUMNS):
+        self.columns = list(columns)
+        self._column_pos = {column: i for i, column in enumerate(self.columns)}
+        iso_years, positions = self._calendar(data)
+        self.years = [int(year) for year in np.unique(iso_years)]
+        self._year_pos = {year: i for i, year in enumerate(self.years)}
+
+        self.matrix = np.full((len(self.columns), len(self.years), self.DAYS), np.nan)
+        self.matrix[:, np.searchsorted(self.years, iso_years), positions] = data[self.columns].to_numpy(dtype=np.float64).T
+        self._sums, self._counts = self._cumulative(self.matrix)
+
+    @staticmethod
+    def _calendar(data):
+        iso = data['Date'].dt.isocalendar()
+        positions = (iso['week'].to_numpy(dtype=np.int64) - 1) * 7 + iso['day'].to_numpy(dtype=np.int64) - 1
+        return iso['year'].to_numpy(dtype=np.int64), positions
+
+    @staticmethod
+    def _cumulative(matrix):
+        present = ~np.isnan(matrix)
+        return np.cumsum(np.where(present, matrix, 0.0), axis=2), np.cumsum(present, axis=2)
+
+    # Overlay for `data`, whose first `start` rows are the rows this one was built from. The matrix is small
+    # (columns x years x DAYS) and copied; only the new rows are placed and only their years re-summed.
+    def extended(self, data, start):
+        new_rows = data.iloc[start:]
+        iso_years, positions = self._calendar(new_rows)
+        overlay = copy.copy(self)
+        overlay.years = sorted(set(self.years) | {int(year) for year in np.unique(iso_years)})
+        overlay._year_pos = {year: i for i, year in enumerate(overlay.years)}
+        old_pos = [overlay._year_pos[year] for year in self.years]
+        overlay.matrix = np.full((len(self.columns), len(overlay.years), self.DAYS), np.nan)
+        overlay.matrix[:, old_pos] = self.matrix
+        overlay._sums = np.zeros(overlay.matrix.shape)
+        overlay._sums[:, old_pos] = self._sums
+        overlay._counts = np.zeros(overlay.matrix.shape, dtype=self._counts.dtype)
+        overlay._counts[:, old_pos] = self._counts
+
+        year_pos = np.searchsorted(overlay.years, iso_years)
+        overlay.matrix[:, year_pos, positions] = new_rows[self.columns].to_numpy(dtype=np.float64).T
+        changed = np.unique(year_pos)
+        overlay._sums[:, changed], overlay._counts[:, changed] = self._cumulative(overlay.matrix[:, changed])
+        return overlay
+
+    # (years, matrix of years x DAYS) for one column
+    def overlay(self, column):
+        return self.years, self.matrix[self._column_pos[column]]
+
+    # Totals of every year over calendar positions 0..through. `through` defaults to the last day `year` has
+    # data for, giving each year's figure for the same period to date. Returns (through, {year: (total, days)}),
+    # or None when `year` has no data.
+    def year_to_date(self, column, year, through=None):
+        i = self._column_pos[column]
+        if through is None:
+            y = self._year_pos.get(year)
+            days = np.flatnonzero(~np.isnan(self.matrix[i, y])) if y is not None else []
+            if len(days) == 0:
+                return None
+            through = int(days[-1])
+        totals = self._sums[i, :, through]
+        counts = self._counts[i, :, through]
+        return through, {year: (float(total), int(days)) for year, total, days in zip(self.years, totals, counts)}
+
+
+# 'Week 44 Thu' for a YearOverlay calendar position
+def calendar_label(position):
+    return f"Week {position // 7 + 1} {WEEKDAYS[position % 7][:3]}"